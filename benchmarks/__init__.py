@@ -0,0 +1 @@
+"""Benchmarks for unrpa, run with “python -m benchmarks.<name>” from the root of the repository."""
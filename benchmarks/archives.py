@@ -0,0 +1,175 @@
+"""
+Generates synthetic archives of every version unrpa supports, for benchmarking.
+
+ZiX archives are given a stub loader, and the details it would give when decompiled are
+put straight into the loader cache, so generating and reading them doesn't need
+uncompyle6.
+"""
+
+import hashlib
+import os
+import pickle
+import random
+import zlib
+from typing import Dict, List, Tuple, Callable, Iterable, Union
+
+from unrpa.versions import zix
+from unrpa.versions.alt import ALT1
+
+# Path, Data
+File = Tuple[str, bytes]
+
+header_size = 64
+zix_code = "0123456789abcdef0123456789abcdef01234567"
+zix_amount = 64
+zix_loader = (
+    f"verificationcode = _string.sha1('{zix_code}')\n"
+    f"rv = _string.run(rv.read({zix_amount}), verificationcode)\n"
+)
+default_key = 0x42424242
+
+# Versions that can be extracted as well as listed. For RPA-1.0, unrpa is given the .rpi
+# file, which is just the index, so it can only be listed.
+extractable = {
+    "RPA-2.0",
+    "RPA-3.0",
+    "ALT-1.0",
+    "ZiX-12A",
+    "ZiX-12B",
+    "RPA-3.2",
+    "RPA-4.0",
+}
+
+
+def extension(version: str) -> str:
+    return ".rpi" if version == "RPA-1.0" else ".rpa"
+
+
+def zix_key() -> int:
+    return zix.obfuscation_sha1(zix_code)
+
+
+def header(version: str, index_offset: int, key: int) -> bytes:
+    if version == "RPA-1.0":
+        return b""
+    elif version == "RPA-2.0":
+        return b"RPA-2.0 %016x\n" % index_offset
+    elif version == "ALT-1.0":
+        return b"ALT-1.0 %08x %016x\n" % (key ^ ALT1.extra_key, index_offset)
+    elif version in ("ZiX-12A", "ZiX-12B"):
+        # The inverse of zix.obfuscation_offset.
+        h = b"%08x" % index_offset
+        value = h[2:5] + h[7:8] + h[6:7] + h[5:6] + h[1:2] + h[0:1]
+        return version.encode("ascii") + b" " + value + b"\n"
+    else:
+        return version.encode("ascii") + b" %016x %08x\n" % (index_offset, key)
+
+
+def version_key(version: str) -> int:
+    if version in ("RPA-1.0", "RPA-2.0"):
+        return 0
+    elif version in ("ZiX-12A", "ZiX-12B"):
+        return zix_key()
+    else:
+        return default_key
+
+
+def write_archive(
+    directory: str, version: str, files: Iterable[File], prefix_length: int = 0
+) -> str:
+    """Write an archive of the given version containing the files, returning the path to it."""
+    path = os.path.join(directory, f"archive{extension(version)}")
+    key = version_key(version)
+    index: Dict[bytes, List[Union[Tuple[int, int], Tuple[int, int, bytes]]]] = {}
+    # RPA-1.0 keeps the data in an .rpa file and the index alone in the .rpi file.
+    data_path = os.path.join(directory, "archive.rpa")
+    with open(data_path, "wb") as archive:
+        if version != "RPA-1.0":
+            archive.write(bytes(header_size))
+        for name, data in files:
+            if version == "ZiX-12B":
+                head = bytearray(data[:zix_amount])
+                zix.obfuscation_run_in_place(head, key)
+                data = bytes(head) + data[zix_amount:]
+            prefix = data[:prefix_length]
+            offset = archive.tell()
+            archive.write(data[len(prefix) :])
+            if prefix or version not in ("RPA-1.0", "RPA-2.0"):
+                index[name.encode("utf-8")] = [
+                    (offset ^ key, len(data) ^ key, prefix)
+                ]
+            else:
+                index[name.encode("utf-8")] = [(offset, len(data))]
+        compressed = zlib.compress(pickle.dumps(index, 2))
+        if version == "RPA-1.0":
+            with open(path, "wb") as index_file:
+                index_file.write(compressed)
+        else:
+            index_offset = archive.tell()
+            archive.write(compressed)
+            archive.seek(0)
+            archive.write(header(version, index_offset, key))
+    if version in ("ZiX-12A", "ZiX-12B"):
+        write_zix_loader(directory)
+    return path
+
+
+def write_zix_loader(directory: str) -> None:
+    loader = zix_loader.encode("utf-8")
+    with open(os.path.join(directory, zix.loader_name), "wb") as file:
+        file.write(loader)
+    digest = hashlib.sha256(loader).hexdigest()
+    with zix.loader_cache.lock:
+        zix.loader_cache.details[digest] = (zix_key(), zix_amount)
+
+
+def random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little") if size else b""
+
+
+def tiny_files(rng: random.Random, scale: float) -> List[File]:
+    """Many tiny files in a shallow tree."""
+    return [
+        (
+            f"images/set{number % 50}/{number}.png",
+            random_bytes(rng, rng.randint(0, 2048)),
+        )
+        for number in range(int(20000 * scale))
+    ]
+
+
+def huge_files(rng: random.Random, scale: float) -> List[File]:
+    """A few huge files."""
+    size = max(1, int(16 * 1024 * 1024 * scale))
+    return [(f"movies/{number}.webm", random_bytes(rng, size)) for number in range(4)]
+
+
+def deep_files(rng: random.Random, scale: float) -> List[File]:
+    """Small files spread over a deep directory tree."""
+    files = []
+    for number in range(int(5000 * scale)):
+        depth = rng.randint(1, 24)
+        directories = "/".join(
+            f"level{level}-{rng.randint(0, 3)}" for level in range(depth)
+        )
+        files.append(
+            (f"{directories}/{number}.rpyc", random_bytes(rng, rng.randint(0, 4096)))
+        )
+    return files
+
+
+def prefixed_files(rng: random.Random, scale: float) -> List[File]:
+    """Small files, to be written with part of each stored as a prefix in the index."""
+    return [
+        (f"audio/{number}.ogg", random_bytes(rng, rng.randint(16, 8192)))
+        for number in range(int(10000 * scale))
+    ]
+
+
+# Name -> (Generator, Prefix Length)
+profiles: Dict[str, Tuple[Callable[[random.Random, float], List[File]], int]] = {
+    "tiny": (tiny_files, 0),
+    "huge": (huge_files, 0),
+    "deep": (deep_files, 0),
+    "prefixed": (prefixed_files, 16),
+}
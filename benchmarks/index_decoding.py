@@ -0,0 +1,102 @@
+"""
+Measures decoding large indexes into a compact index.
+
+This compares unpickling with pickle and normalising the entries one at a time, as was
+done before, against the restricted unpickler and building the compact index a column at
+a time that is used now, for the shapes of index Ren'Py writes.
+"""
+
+import argparse
+import io
+import os
+import pickle
+import random
+import time
+from typing import Dict, List, Tuple, Callable, Any, Optional
+
+from unrpa import UnRPA
+from unrpa.index import CompactIndex
+from unrpa.unpickle import load_index, compact_index, collection_paused
+
+key = 0xDEADBEEF
+
+
+def make_index(
+    count: int, path_type: type, prefix_length: Optional[int]
+) -> Dict[Any, List[Tuple[Any, ...]]]:
+    index = {}
+    for number in range(count):
+        path = f"images/directory{number % 300}/file{number}.png"
+        offset = random.getrandbits(32)
+        length = random.getrandbits(32)
+        if prefix_length is None:
+            part: Tuple[Any, ...] = (offset, length)
+        else:
+            part = (offset, length, os.urandom(prefix_length))
+        index[path.encode("utf-8") if path_type is bytes else path] = [part]
+    return index
+
+
+def pickle_and_normalise(data: bytes) -> CompactIndex:
+    index = pickle.load(io.BytesIO(data), encoding="bytes")
+    normal_index = CompactIndex.build(
+        (
+            UnRPA.ensure_str_path(path).replace("/", os.sep),
+            UnRPA.normalise_part(next(iter(entry))),
+        )
+        for path, entry in index.items()
+    )
+    normal_index.deobfuscate(key)
+    return normal_index
+
+
+def restricted_and_columns(data: bytes) -> CompactIndex:
+    with collection_paused():
+        normal_index = compact_index(load_index(io.BytesIO(data)), key)
+    assert normal_index is not None
+    return normal_index
+
+
+def measure(data: bytes, decode: Callable[[bytes], CompactIndex], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--files", type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    shapes = {
+        "str paths": (str, 0),
+        "bytes paths": (bytes, 0),
+        "no prefixes": (str, None),
+        "prefixed": (str, 16),
+    }
+    decoders = (
+        ("pickle", pickle_and_normalise),
+        ("restricted", restricted_and_columns),
+    )
+    for shape, (path_type, prefix_length) in shapes.items():
+        index = make_index(args.files, path_type, prefix_length)
+        for protocol in (2, 4):
+            data = pickle.dumps(index, protocol)
+            assert list(pickle_and_normalise(data).rows()) == list(
+                restricted_and_columns(data).rows()
+            )
+            for name, decode in decoders:
+                best = measure(data, decode, args.repeat)
+                print(
+                    f"{shape:>12} | protocol {protocol} | {name:>10} | "
+                    f"{len(index):>7} files | {best * 1000:8.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
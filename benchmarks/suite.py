@@ -0,0 +1,230 @@
+"""
+Benchmarks unrpa across every archive version and a range of archive shapes.
+
+For each version and profile, a synthetic archive is generated and the time taken to
+decode the index, list and tree the archive, and extract it are measured, along with the
+peak memory allocated while decoding the index and extracting. Results are written as
+JSON, and can be compared against an earlier run to spot regressions.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any, Callable, List, Optional
+
+from benchmarks import archives
+from unrpa import UnRPA, meta
+
+# The measurements where a higher number is better, the rest are times or sizes where
+# lower is better.
+higher_is_better = {"extract_mib_per_second"}
+
+
+def best_time(
+    action: Callable[[], Any], repeat: int, reset: Callable[[], Any] = lambda: None
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        reset()
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(action: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        action()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def get_index(path: str) -> None:
+    extractor = UnRPA(path)
+    with open(path, "rb") as archive:
+        extractor.get_index(archive)
+
+
+def list_files(path: str) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        UnRPA(path).list_files()
+
+
+def tree(path: str) -> None:
+    for _ in UnRPA(path).tree_lines():
+        pass
+
+
+def extract(path: str, output: str, workers: int) -> Callable[[], None]:
+    def action() -> None:
+        UnRPA(path, path=output, mkdir=True, workers=workers).extract_files()
+
+    return action
+
+
+def remover(path: str) -> Callable[[], None]:
+    return lambda: shutil.rmtree(path, ignore_errors=True)
+
+
+def measure(
+    version: str, profile: str, directory: str, repeat: int, scale: float, workers: int
+) -> Dict[str, Any]:
+    generate, prefix_length = archives.profiles[profile]
+    files = generate(random.Random(0), scale)
+    path = archives.write_archive(directory, version, files, prefix_length)
+    total_bytes = sum(len(data) for _, data in files)
+    result: Dict[str, Any] = {
+        "version": version,
+        "profile": profile,
+        "files": len(files),
+        "bytes": total_bytes,
+        "index_seconds": best_time(lambda: get_index(path), repeat),
+        "index_peak_bytes": peak_memory(lambda: get_index(path)),
+        "list_seconds": best_time(lambda: list_files(path), repeat),
+        "tree_seconds": best_time(lambda: tree(path), repeat),
+    }
+    if version in archives.extractable:
+        output = os.path.join(directory, "extracted")
+        action = extract(path, output, workers)
+        seconds = best_time(action, repeat, remover(output))
+        result["extract_seconds"] = seconds
+        result["extract_mib_per_second"] = total_bytes / (1024 * 1024) / seconds
+        remover(output)()
+        result["extract_peak_bytes"] = peak_memory(action)
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> None:
+    """Print how each measurement changed relative to an earlier run, as a ratio where above 1 is an improvement."""
+    earlier = {(result["version"], result["profile"]): result for result in baseline}
+    for result in results:
+        before = earlier.get((result["version"], result["profile"]))
+        if not before:
+            continue
+        changes = []
+        for name, value in result.items():
+            old = before.get(name)
+            if (
+                not name.endswith(("_seconds", "_bytes"))
+                and name not in higher_is_better
+            ):
+                continue
+            if not isinstance(old, (int, float)) or not old or not value:
+                continue
+            ratio = value / old if name in higher_is_better else old / value
+            changes.append(f"{name} {ratio:.2f}x")
+        print(f"{result['version']:>8} | {result['profile']:>8} | {', '.join(changes)}")
+
+
+def run(
+    versions: List[str],
+    profiles: List[str],
+    repeat: int,
+    scale: float,
+    workers: int,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    results = []
+    for profile in profiles:
+        for version in versions:
+            with tempfile.TemporaryDirectory() as directory:
+                result = measure(version, profile, directory, repeat, scale, workers)
+            if progress:
+                progress(result)
+            results.append(result)
+    return {
+        "unrpa": meta.version,
+        "python": sys.version,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scale": scale,
+        "workers": workers,
+        "results": results,
+    }
+
+
+def report(result: Dict[str, Any]) -> None:
+    extraction = (
+        f"{result['extract_mib_per_second']:8.1f} MiB/s"
+        if "extract_mib_per_second" in result
+        else "           n/a"
+    )
+    print(
+        f"{result['version']:>8} | {result['profile']:>8} | "
+        f"{result['files']:>6} files | "
+        f"index {result['index_seconds'] * 1000:8.1f} ms | "
+        f"list {result['list_seconds'] * 1000:8.1f} ms | "
+        f"tree {result['tree_seconds'] * 1000:8.1f} ms | "
+        f"extract {extraction}",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    versions = [version.name for version in UnRPA.ordered_versions]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--version",
+        dest="versions",
+        action="append",
+        choices=versions,
+        help="only benchmark this version (can be given more than once).",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profiles",
+        action="append",
+        choices=list(archives.profiles),
+        help="only benchmark this archive profile (can be given more than once).",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiply the size of the generated archives by this.",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--output", metavar="FILE", help="write the results to this file as JSON."
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="compare the results against an earlier run's JSON output.",
+    )
+    args = parser.parse_args()
+
+    results = run(
+        args.versions or versions,
+        args.profiles or list(archives.profiles),
+        args.repeat,
+        args.scale,
+        args.workers,
+        report,
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results["results"], json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
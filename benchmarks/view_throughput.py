@@ -0,0 +1,84 @@
+"""
+Measures the throughput of copying files out of an archive through an ArchiveView.
+
+This compares the chunked read1 loop postprocessing used to use against the
+buffer-reusing copy that is used now, for many small files and a few large ones.
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple, Callable, BinaryIO
+
+from unrpa.view import ArchiveView
+
+# Offset, Length, Prefix
+Entry = Tuple[int, int, bytes]
+
+
+def make_archive(path: str, sizes: List[int], prefix_every: int) -> List[Entry]:
+    entries = []
+    with open(path, "wb") as archive:
+        for number, size in enumerate(sizes):
+            prefix = os.urandom(min(size, 16)) if number % prefix_every == 0 else b""
+            entries.append((archive.tell(), size, prefix))
+            archive.write(os.urandom(size - len(prefix)))
+    return entries
+
+
+def read1_loop(source: ArchiveView, sink: BinaryIO) -> None:
+    for segment in iter(source.read1, b""):
+        sink.write(segment)
+
+
+def copy_to(source: ArchiveView, sink: BinaryIO) -> None:
+    source.copy_to(sink)
+
+
+class NullSink(io.RawIOBase):
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore
+        return len(data)
+
+
+def measure(
+    path: str, entries: List[Entry], copy: Callable[[ArchiveView, BinaryIO], None]
+) -> float:
+    sink = NullSink()
+    with open(path, "rb") as archive:
+        start = time.perf_counter()
+        for offset, length, prefix in entries:
+            copy(ArchiveView(archive, offset, length, prefix), sink)  # type: ignore
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    profiles = {
+        "small files": [random.randint(64, 16 * 1024) for _ in range(20000)],
+        "large files": [random.randint(8, 32) * 1024 * 1024 for _ in range(8)],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for profile, sizes in profiles.items():
+            path = os.path.join(directory, "archive")
+            entries = make_archive(path, sizes, prefix_every=3)
+            total = sum(sizes) / (1024 * 1024)
+            for name, copy in (("read1 loop", read1_loop), ("copy_to", copy_to)):
+                best = min(measure(path, entries, copy) for _ in range(args.repeat))
+                print(
+                    f"{profile:>12} | {name:>10} | {len(entries):>6} files | "
+                    f"{total / best:8.1f} MiB/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
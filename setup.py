@@ -13,7 +13,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/Lattyware/unrpa",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
     python_requires=">=3.7",
     keywords="renpy rpa archive extract",
     classifiers=[
@@ -24,5 +24,5 @@ setuptools.setup(
         "Environment :: Console",
     ],
     entry_points={"console_scripts": ["unrpa = unrpa.__main__:main"]},
-    extras_require={"ZiX": "uncompyle6>=3.5.0"},
+    extras_require={"ZiX": "uncompyle6>=3.5.0", "speedups": "numpy"},
 )
@@ -1,10 +1,13 @@
-import itertools
-import operator
+import asyncio
+import functools
+import io
+import mmap
 import os
-import pickle
 import sys
+import threading
+import time
 import traceback
-import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import (
     Union,
     Tuple,
@@ -16,6 +19,9 @@ from typing import (
     BinaryIO,
     FrozenSet,
     Sequence,
+    List,
+    ContextManager,
+    Iterator,
 )
 
 from unrpa.errors import (
@@ -24,39 +30,63 @@ from unrpa.errors import (
     AmbiguousArchiveError,
     UnknownArchiveError,
 )
+from unrpa.cache import IndexCache
+from unrpa.dedupe import Deduplicator, Content, open_output_file
+from unrpa.export import ArchiveExporter
+from unrpa.filters import PathFilter
+from unrpa.index import (
+    CompressedIndexStream,
+    CompactIndex,
+    SimpleIndexPart,
+    SimpleIndexEntry,
+    ComplexIndexPart,
+    ComplexIndexEntry,
+    IndexPart,
+    IndexEntry,
+)
+from unrpa.manifest import ExtractionManifest
+from unrpa.output import AtomicOutput
+from unrpa.pipeline import ExtractionPipeline
+from unrpa.plan import ExtractionPlan
+from unrpa.schedule import ExtractionSchedule, ScheduledRead
+from unrpa.serve import ArchiveServer
+from unrpa.session import ArchiveSession
+from unrpa.stats import ArchiveStats, not_measured
+from unrpa.unpickle import load_index, compact_index, collection_paused
 from unrpa.versions import official_rpa, alt, zix, unofficial_rpa
 from unrpa.versions.version import Version
-from unrpa.view import ArchiveView
-
-# Offset, Length
-SimpleIndexPart = Tuple[int, int]
-SimpleIndexEntry = Iterable[SimpleIndexPart]
-# Offset, Length, Prefix
-ComplexIndexPart = Tuple[int, int, bytes]
-ComplexIndexEntry = Iterable[ComplexIndexPart]
-IndexPart = Union[SimpleIndexPart, ComplexIndexPart]
-IndexEntry = Iterable[IndexPart]
+from unrpa.view import ArchiveView, MappedArchiveView, ViewFactory
 
 
 class TreeNode:
-    def __init__(self, name: str, children: Iterable[Sequence[str]]) -> None:
+    __slots__ = ("name", "children")
+
+    def __init__(self, name: str, children: Optional[List["TreeNode"]] = None) -> None:
         self.name = name
-        if children:
-            self.children = [
-                TreeNode(
-                    child,
-                    [
-                        subchild[1:]
-                        for subchild in children_of_child
-                        if len(subchild) > 1
-                    ],
-                )
-                for (child, children_of_child) in itertools.groupby(
-                    children, key=operator.itemgetter(0)
-                )
-            ]
-        else:
-            self.children = []
+        self.children = children if children is not None else []
+
+    @staticmethod
+    def build(name: str, paths: Iterable[Sequence[str]]) -> "TreeNode":
+        """Build a tree in a single pass from paths (as sequences of their parts) in sorted order.
+
+        The order only has to keep the paths under each directory together, so the string order of an index works.
+        """
+        root = TreeNode(name)
+        branch = [root]
+        previous: Sequence[str] = ()
+        for parts in paths:
+            common = 0
+            for old, new in zip(previous, parts):
+                if old != new:
+                    break
+                common += 1
+            del branch[common + 1 :]
+            for part in parts[common:]:
+                node = TreeNode(part)
+                branch[-1].children.append(node)
+                branch.append(node)
+            previous = parts
+        return root
 
 
 class UnRPA:
@@ -87,6 +117,17 @@ class UnRPA:
         continue_on_error: bool = False,
         offset_and_key: Optional[Tuple[int, int]] = None,
         extra_versions: FrozenSet[Type[Version]] = frozenset(),
+        workers: int = 1,
+        memory_map: bool = False,
+        cache: Optional[IndexCache] = None,
+        path_filter: Optional[PathFilter] = None,
+        ordered: bool = False,
+        resume: bool = False,
+        stats: Optional[ArchiveStats] = None,
+        deduplicator: Optional[Deduplicator] = None,
+        diff_base: Optional[str] = None,
+        preallocate: bool = False,
+        check_space: bool = True,
     ) -> None:
         self.verbose = verbosity
         if path:
@@ -100,6 +141,19 @@ class UnRPA:
         self.offset_and_key = offset_and_key
         self.tty = sys.stdout.isatty()
         self.versions = UnRPA.provided_versions | extra_versions
+        self.workers = max(1, workers)
+        self.memory_map = memory_map
+        self.cache = cache
+        if cache:
+            zix.loader_cache.use_directory(cache.directory)
+        self.path_filter = path_filter
+        self.ordered = ordered
+        self.resume = resume
+        self.stats = stats
+        self.deduplicator = deduplicator
+        self.diff_base = diff_base
+        self.preallocate = preallocate
+        self.check_space = check_space
 
     def log(
         self, verbosity: int, human_message: str, machine_message: str = None
@@ -110,56 +164,438 @@ class UnRPA:
                 file=sys.stderr if verbosity == UnRPA.error else sys.stdout,
             )
 
-    def extract_files(self) -> None:
+    def measure(self) -> ContextManager[None]:
+        """Measure a whole operation, if stats are being collected."""
+        return self.stats.run() if self.stats else not_measured
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Time a phase of an operation, if stats are being collected."""
+        return self.stats.phase(name) if self.stats else not_measured
+
+    def session(self) -> ArchiveSession:
+        """Open the archive for any number of operations, which share its version, offset and key, and index."""
+        return ArchiveSession(self)
+
+    def extract_files(self) -> List[Tuple[str, str]]:
+        """Extract the archive, returning the path and error detail of each file that failed if continuing on error."""
+        with self.measure():
+            with self.session() as session:
+                return self.extract_all(session)
+
+    def extract_all(self, session: ArchiveSession) -> List[Tuple[str, str]]:
+        version = self.prepare_extraction(session)
+        archive = session.file
+        index = session.get_index()
+        if self.diff_base:
+            index = self.apply_diff(session)
+        if self.resume:
+            with ExtractionManifest.for_archive(self.path, self.archive) as manifest:
+                failures = self.extract_index(
+                    version, self.remaining(index, manifest), archive, manifest
+                )
+        else:
+            failures = self.extract_index(version, index, archive)
+        if self.deduplicator:
+            self.deduplicator.save()
+        self.report_failures(failures)
+        return failures
+
+    async def extract_files_async(
+        self, max_buffered: int = 64 * 1024 * 1024
+    ) -> List[Tuple[str, str]]:
+        """Extract the archive without blocking the event loop.
+
+        Reading from the archive and writing the extracted files are overlapped, with one writer per worker, and the
+        reader waits for the writers whenever about max_buffered bytes are waiting to be written. Deduplicating isn't
+        supported, as the writers can't link a file to one they haven't finished writing yet, and nor is extracting
+        only the changes since a diff base.
+        """
+        if self.deduplicator:
+            raise ValueError(
+                "Files can't be deduplicated when extracting asynchronously."
+            )
+        if self.diff_base:
+            raise ValueError(
+                "Extracting only the changes since a diff base isn't supported asynchronously."
+            )
+        loop = asyncio.get_event_loop()
+        with self.measure(), self.session() as session:
+            await loop.run_in_executor(None, self.prepare_extraction, session)
+            manifest = None
+            if self.resume:
+                manifest = ExtractionManifest.for_archive(self.path, self.archive)
+                await loop.run_in_executor(None, manifest.__enter__)
+            try:
+                pipeline = ExtractionPipeline(
+                    self, session, manifest, self.workers, max_buffered
+                )
+                failures = await pipeline.run()
+            finally:
+                if manifest:
+                    await loop.run_in_executor(None, manifest.close)
+        self.report_failures(failures)
+        return failures
+
+    def prepare_extraction(self, session: ArchiveSession) -> Version:
+        """Make sure there is somewhere to extract to, and find the archive's version."""
         self.log(UnRPA.error, f"Extracting files from {self.archive}.")
         if self.mkdir:
             self.make_directory_structure(self.path)
         if not os.path.isdir(self.path):
             raise OutputDirectoryNotFoundError(self.path)
+        return session.get_version()
 
-        version = self.version() if self.version else self.detect_version()
+    def apply_diff(self, session: ArchiveSession) -> CompactIndex:
+        """Narrow the index to the files added or changed since the diff base, deleting removed ones."""
+        diff = session.diff()
+        self.log(UnRPA.error, f"Changes since {self.diff_base}: {diff.summary()}")
+        for path in diff.removed:
+            output_path = os.path.abspath(os.path.join(self.path, path))
+            if os.path.commonpath([self.path, output_path]) != self.path:
+                continue
+            if os.path.isfile(output_path):
+                self.log(UnRPA.info, f"Removing {path}.")
+                os.remove(output_path)
+        to_extract = set(diff.to_extract())
+        return session.get_index().filter(lambda path, part: path in to_extract)
 
-        with open(self.archive, "rb") as archive:
-            index = self.get_index(archive, version)
-            total_files = len(index)
-            for file_number, (path, data) in enumerate(index.items()):
+    def extract_index(
+        self,
+        version: Version,
+        index: CompactIndex,
+        archive: BinaryIO,
+        manifest: Optional[ExtractionManifest] = None,
+    ) -> List[Tuple[str, str]]:
+        plan = self.plan(index)
+        schedule = self.schedule(index)
+        mapped = self.mapped_views(archive) if self.memory_map else None
+        if self.workers > 1:
+            return self.extract_parallel(version, schedule, mapped, manifest, plan)
+        else:
+            return self.extract_sequential(
+                version, schedule, archive, mapped, manifest, plan
+            )
+
+    def plan(self, index: CompactIndex) -> ExtractionPlan:
+        """Plan extracting the given entries, checking they will fit and creating every directory they need."""
+        with self.phase("plan_extraction"):
+            plan = ExtractionPlan.for_index(self.path, index, self.preallocate)
+            if self.check_space:
+                plan.check_free_space()
+        with self.phase("create_directories"):
+            plan.create_directories(self)
+        return plan
+
+    def remaining(
+        self, index: CompactIndex, manifest: ExtractionManifest
+    ) -> CompactIndex:
+        """The entries that haven't already been completely extracted according to the manifest."""
+        remaining = index.filter(
+            lambda path, part: not manifest.is_complete(
+                path, [part], os.path.join(self.path, path)
+            )
+        )
+        self.log(
+            UnRPA.info,
+            f"Resuming extraction, skipping {len(index) - len(remaining)} files that are already extracted.",
+        )
+        return remaining
+
+    def schedule(self, index: CompactIndex) -> ExtractionSchedule:
+        if self.ordered:
+            schedule = ExtractionSchedule.by_offset(index)
+            self.log(
+                UnRPA.info,
+                f"Reading in archive order, with {len(schedule.reads)} reads for {schedule.total_files} files, "
+                f"saving {schedule.seek_distance_saved} bytes of seeking.",
+            )
+            return schedule
+        else:
+            return ExtractionSchedule.in_index_order(index)
+
+    def mapped_views(self, archive: BinaryIO) -> ViewFactory:
+        """Map the whole archive into memory once, giving views that slice the mapping rather than copying."""
+        mapping = memoryview(mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ))
+        return functools.partial(MappedArchiveView, mapping, self.archive)
+
+    def extract_sequential(
+        self,
+        version: Version,
+        schedule: ExtractionSchedule,
+        archive: BinaryIO,
+        mapped: Optional[ViewFactory] = None,
+        manifest: Optional[ExtractionManifest] = None,
+        plan: Optional[ExtractionPlan] = None,
+    ) -> List[Tuple[str, str]]:
+        failures = []
+        for read in schedule.reads:
+            failures.extend(
+                self.extract_read(
+                    version, read, archive, mapped, schedule.total_files, manifest, plan
+                )
+            )
+        return failures
+
+    def extract_parallel(
+        self,
+        version: Version,
+        schedule: ExtractionSchedule,
+        mapped: Optional[ViewFactory] = None,
+        manifest: Optional[ExtractionManifest] = None,
+        plan: Optional[ExtractionPlan] = None,
+    ) -> List[Tuple[str, str]]:
+        """Extract the entries on a pool of threads, each reading through its own handle on the archive."""
+        local = threading.local()
+        handles: List[BinaryIO] = []
+        handles_lock = threading.Lock()
+
+        def extract(read: ScheduledRead) -> List[Tuple[str, str]]:
+            archive: Optional[BinaryIO] = getattr(local, "archive", None)
+            if archive is None:
+                archive = open(self.archive, "rb")
+                with handles_lock:
+                    handles.append(archive)
+                local.archive = archive
+            return self.extract_read(
+                version, read, archive, mapped, schedule.total_files, manifest, plan
+            )
+
+        failures = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(extract, read) for read in schedule.reads]
+                for future in as_completed(futures):
+                    try:
+                        failures.extend(future.result())
+                    except ErrorExtractingFile:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+        finally:
+            for handle in handles:
+                handle.close()
+        return failures
+
+    def extract_read(
+        self,
+        version: Version,
+        read: ScheduledRead,
+        archive: BinaryIO,
+        mapped: Optional[ViewFactory],
+        total_files: int,
+        manifest: Optional[ExtractionManifest] = None,
+        plan: Optional[ExtractionPlan] = None,
+    ) -> List[Tuple[str, str]]:
+        failures: List[Tuple[str, str]] = []
+        for path, data, file_view in self.scheduled_views(
+            [read], archive, mapped, total_files, failures
+        ):
+            try:
+                self.extract_entry(version, file_view, path, data, manifest, plan)
+            except BaseException as error:
+                failures.append(self.handle_error(path, error))
+        return failures
+
+    def scheduled_views(
+        self,
+        reads: Iterable[ScheduledRead],
+        archive: BinaryIO,
+        mapped: Optional[ViewFactory],
+        total_files: int,
+        failures: List[Tuple[str, str]],
+    ) -> Iterator[Tuple[str, ComplexIndexEntry, ArchiveView]]:
+        """The path, entry and a view of the data of each file in the given reads, in order.
+
+        Files whose data can't be read are handled as errors (see handle_error) and added to failures instead.
+        """
+        for read in reads:
+            try:
+                view_of = mapped or read.views(archive)
+            except BaseException as error:
+                failures.extend(
+                    self.handle_error(path, error) for _, path, _ in read.entries
+                )
+                continue
+            for file_number, path, data in read.entries:
                 try:
-                    self.make_directory_structure(
-                        os.path.join(self.path, os.path.split(path)[0])
-                    )
                     file_view = self.extract_file(
-                        path, data, file_number, total_files, archive
+                        path, data, file_number, total_files, view_of
                     )
-                    with open(os.path.join(self.path, path), "wb") as output_file:
-                        version.postprocess(file_view, output_file)
                 except BaseException as error:
-                    if self.continue_on_error:
-                        self.log(
-                            0,
-                            f"Error extracting from the archive, but directed to continue on error. Detail: "
-                            f"{traceback.format_exc()}.",
-                        )
-                    else:
-                        raise ErrorExtractingFile(traceback.format_exc()) from error
+                    failures.append(self.handle_error(path, error))
+                    continue
+                yield path, data, file_view
+
+    def extract_entry(
+        self,
+        version: Version,
+        file_view: ArchiveView,
+        path: str,
+        data: ComplexIndexEntry,
+        manifest: Optional[ExtractionManifest] = None,
+        plan: Optional[ExtractionPlan] = None,
+    ) -> None:
+        directory = os.path.dirname(path)
+        if not plan or not plan.created(directory):
+            with self.phase("create_directories"):
+                self.make_directory_structure(os.path.join(self.path, directory))
+        output_path = os.path.join(self.path, path)
+        with self.phase("copy_data"):
+            if manifest:
+                with AtomicOutput(output_path) as output:
+                    size, content = self.write_entry(
+                        version, file_view, data, output.temporary, plan
+                    )
+                manifest.record(path, data, size)
+            else:
+                size, content = self.write_entry(
+                    version, file_view, data, output_path, plan
+                )
+            if self.deduplicator and content:
+                self.deduplicator.register(
+                    self.archive, next(iter(data)), path, output_path, content
+                )
+        if self.stats:
+            _, length, prefix = next(iter(data))
+            self.stats.count_file(max(0, length - len(prefix)), size)
+
+    def write_entry(
+        self,
+        version: Version,
+        file_view: ArchiveView,
+        data: ComplexIndexEntry,
+        output_path: str,
+        plan: Optional[ExtractionPlan] = None,
+    ) -> Tuple[int, Optional[Content]]:
+        """Write an entry's data to the given path, returning its size and (if deduplicating) its content."""
+        part = next(iter(data))
+        if self.deduplicator:
+            content = self.deduplicator.write(
+                self.archive, version, file_view, part, output_path
+            )
+            return content[0], content
+        if plan:
+            output_file = plan.open_output(output_path, part[1])
+        else:
+            output_file = open_output_file(output_path)
+        with output_file:
+            version.postprocess(file_view, output_file)
+            if plan and plan.preallocate:
+                output_file.truncate()
+            return output_file.tell(), None
+
+    def handle_error(self, path: str, error: BaseException) -> Tuple[str, str]:
+        detail = "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        )
+        if self.continue_on_error:
+            self.log(
+                0,
+                f"Error extracting from the archive, but directed to continue on error. Detail: {detail}.",
+            )
+            return path, detail
+        else:
+            raise ErrorExtractingFile(detail) from error
+
+    def report_failures(self, failures: List[Tuple[str, str]]) -> None:
+        """Tell the user which files failed, even when not at a terminal, as they are missing from the output."""
+        if failures:
+            paths = "\n".join(f"    {path}" for path, _ in sorted(failures))
+            print(
+                f"Failed to extract {len(failures)} file(s) from {self.archive}:\n{paths}",
+                file=sys.stderr,
+            )
+
+    def open(self, member: str) -> io.BufferedIOBase:
+        """Open a single file in the archive for reading, without extracting it.
+
+        The file is seekable and reads are positional, so any number can be open at once. Versions that transform the
+        data (see Version.has_postprocessing) can't be read in place, so the file is transformed into memory instead.
+        """
+        session = self.session()
+        try:
+            return session.open(member, close_session=True)
+        except BaseException:
+            session.close()
+            raise
+
+    def read(self, member: str) -> bytes:
+        """Read the whole of a single file in the archive, without extracting it."""
+        with self.open(member) as file:
+            return file.read()
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        """Serve the files in the archive over HTTP until interrupted, without extracting them."""
+        with self.session() as session, ArchiveServer(session, (host, port)) as server:
+            server_host, server_port = server.socket.getsockname()[:2]
+            self.log(
+                UnRPA.error,
+                f"Serving files from {self.archive} at http://{server_host}:{server_port}/",
+            )
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+    def export(self, exporter: ArchiveExporter) -> List[Tuple[str, str]]:
+        """Write the files in the archive into an exporter (see ArchiveExporter.for_path) without extracting them."""
+        self.log(UnRPA.error, f"Exporting files from {self.archive}.")
+        failures: List[Tuple[str, str]] = []
+        with self.measure(), self.session() as session:
+            version = session.get_version()
+            index = session.get_index()
+            archive = session.file
+            mtime = os.fstat(archive.fileno()).st_mtime
+            schedule = self.schedule(index)
+            mapped = self.mapped_views(archive) if self.memory_map else None
+            for path, data, file_view in self.scheduled_views(
+                schedule.reads, archive, mapped, schedule.total_files, failures
+            ):
+                _, length, prefix = next(iter(data))
+                # Once a file is partly written the export can't carry on, so errors here always stop it.
+                with self.phase("copy_data"):
+                    added = exporter.add(
+                        path.replace(os.sep, "/"),
+                        length,
+                        mtime,
+                        functools.partial(version.postprocess, file_view),
+                    )
+                if not added:
+                    self.log(
+                        UnRPA.info,
+                        f"Skipping {path}, as a file with the same name was already exported.",
+                    )
+                elif self.stats:
+                    self.stats.count_file(max(0, length - len(prefix)), length)
+        self.report_failures(failures)
+        return failures
 
     def list_files(self) -> None:
         self.log(UnRPA.info, f"Listing files in {self.archive}:")
-        with open(self.archive, "rb") as archive:
-            paths = self.get_index(archive).keys()
-        for path in sorted(paths):
-            print(path)
+        with self.measure():
+            with self.session() as session:
+                if self.diff_base:
+                    lines: Iterable[str] = list(session.diff().lines())
+                else:
+                    lines = session.paths()
+            for line in lines:
+                print(line)
 
     def list_files_tree(self) -> None:
-        print(self.archive)
-        for line in self.tree_lines():
-            print(line)
+        with self.measure():
+            print(self.archive)
+            for line in self.tree_lines():
+                print(line)
 
     def tree(self) -> TreeNode:
-        with open(self.archive, "rb") as archive:
-            paths = sorted(self.get_index(archive).keys())
-        return TreeNode(
+        with self.session() as session:
+            return session.tree()
+
+    def index_tree(self, index: CompactIndex) -> TreeNode:
+        # The index is already in path order, which is the order the tree is drawn in.
+        return TreeNode.build(
             self.archive,
-            [list(reversed(list(self.full_split(path)))) for path in paths],
+            ([part for part in path.split(os.sep) if part] for path in index),
         )
 
     @staticmethod
@@ -173,13 +609,23 @@ class UnRPA:
     ) -> Iterable[str]:
         if not current_node:
             current_node = self.tree()
-        for child in current_node.children[:-1]:
-            yield f"{prefix}├--- {child.name}"
-            yield from self.tree_lines(child, f"{prefix}|    ")
-        if current_node.children:
-            child = current_node.children[-1]
-            yield f"{prefix}└--- {child.name}"
-            yield from self.tree_lines(child, f"{prefix}     ")
+        # The nodes still to be drawn, with their prefix and if they are the last child, in reverse order.
+        pending = [
+            (child, prefix, index == 0)
+            for index, child in enumerate(reversed(current_node.children))
+        ]
+        while pending:
+            node, node_prefix, last = pending.pop()
+            if last:
+                yield f"{node_prefix}└--- {node.name}"
+                child_prefix = f"{node_prefix}     "
+            else:
+                yield f"{node_prefix}├--- {node.name}"
+                child_prefix = f"{node_prefix}|    "
+            pending.extend(
+                (child, child_prefix, index == 0)
+                for index, child in enumerate(reversed(node.children))
+            )
 
     def extract_file(
         self,
@@ -187,57 +633,141 @@ class UnRPA:
         data: ComplexIndexEntry,
         file_number: int,
         total_files: int,
-        archive: BinaryIO,
+        view_of: ViewFactory,
     ) -> ArchiveView:
         self.log(
             UnRPA.info, f"[{file_number / float(total_files):04.2%}] {name:>3}", name
         )
         offset, length, start = next(iter(data))
-        return ArchiveView(archive, offset, length, start)
+        return view_of(offset, length, start)
 
     def make_directory_structure(self, name: str) -> None:
         self.log(UnRPA.debug, f"Creating directory structure: {name}")
-        if not os.path.exists(name):
-            os.makedirs(name)
+        os.makedirs(name, exist_ok=True)
 
     def get_index(
-        self, archive: BinaryIO, version: Optional[Version] = None
-    ) -> Dict[str, ComplexIndexEntry]:
+        self,
+        archive: BinaryIO,
+        version: Optional[Version] = None,
+        offset_and_key: Optional[Tuple[int, Optional[int]]] = None,
+    ) -> CompactIndex:
+        cached = self.cached_index()
+        if cached is not None:
+            if (
+                version
+                and not (offset_and_key or self.offset_and_key)
+                and version.has_postprocessing()
+            ):
+                # Versions with their own postprocessing may rely on state set up while finding the offset and key.
+                with self.phase("find_offset_and_key"):
+                    version.find_offset_and_key(archive)
+            return cached
+        return self.decode_index(archive, version, offset_and_key)
+
+    def index_cache_key(self) -> Optional[str]:
+        if not self.cache:
+            return None
+        return self.cache.key(
+            self.archive,
+            self.version.name if self.version else None,
+            self.offset_and_key,
+        )
+
+    def cached_index(self) -> Optional[CompactIndex]:
+        """The archive's index from the index cache, if there is one and the index is in it."""
+        cache_key = self.index_cache_key()
+        if not self.cache or not cache_key:
+            return None
+        with self.phase("index_cache"):
+            cached = self.cache.load(cache_key)
+        if cached is not None:
+            self.log(UnRPA.debug, f"Using cached index for {self.archive}.")
+        return cached
+
+    def decode_index(
+        self,
+        archive: BinaryIO,
+        version: Optional[Version] = None,
+        offset_and_key: Optional[Tuple[int, Optional[int]]] = None,
+    ) -> CompactIndex:
+        """Decode the archive's index from the archive itself, storing it in the index cache if there is one."""
+        cache_key = self.index_cache_key()
         if not version:
             version = self.version() if self.version else self.detect_version()
 
         offset = 0
         key: Optional[int] = None
-        if self.offset_and_key:
-            offset, key = self.offset_and_key
+        offset_and_key = offset_and_key or self.offset_and_key
+        if offset_and_key:
+            offset, key = offset_and_key
         else:
-            offset, key = version.find_offset_and_key(archive)
+            with self.phase("find_offset_and_key"):
+                offset, key = version.find_offset_and_key(archive)
         archive.seek(offset)
-        index: Dict[bytes, IndexEntry] = pickle.loads(
-            zlib.decompress(archive.read()), encoding="bytes"
+        stream = CompressedIndexStream(archive)
+        with collection_paused():
+            start = time.perf_counter()
+            index: Dict[bytes, IndexEntry] = load_index(io.BufferedReader(stream))
+            if self.stats:
+                loading = time.perf_counter() - start
+                self.stats.add("decompress_index", stream.decompression_time)
+                self.stats.add("unpickle_index", loading - stream.decompression_time)
+                self.stats.count_read(stream.compressed_size)
+            with self.phase("normalise_index"):
+                normal_index = compact_index(index, key)
+                if normal_index is None:
+                    self.log(UnRPA.debug, "Normalising an unusually shaped index.")
+                    normal_index = UnRPA.normalise_unusual_index(index, key)
+        if self.cache and cache_key:
+            with self.phase("index_cache"):
+                self.cache.store(cache_key, normal_index)
+        return normal_index
+
+    @staticmethod
+    def normalise_unusual_index(
+        index: Dict[bytes, IndexEntry], key: Optional[int]
+    ) -> CompactIndex:
+        """Normalise an index an entry at a time, for any that compact_index can't handle as a whole."""
+        normal_index = CompactIndex.build(
+            (
+                UnRPA.ensure_str_path(path).replace("/", os.sep),
+                UnRPA.normalise_part(next(iter(entry))),
+            )
+            for path, entry in index.items()
         )
         if key is not None:
-            normal_index = UnRPA.deobfuscate_index(key, index)
+            normal_index.deobfuscate(key)
+        return normal_index
+
+    def select(self, index: CompactIndex) -> CompactIndex:
+        """Narrow the index down to the paths selected by the path filter, if there is one."""
+        path_filter = self.path_filter
+        if path_filter:
+            return index.filter(lambda path, part: path_filter.matches(path))
         else:
-            normal_index = UnRPA.normalise_index(index)
+            return index
 
-        return {
-            UnRPA.ensure_str_path(path).replace("/", os.sep): data
-            for path, data in normal_index.items()
-        }
+    def detect_version(self, archive: Optional[BinaryIO] = None) -> Version:
+        with self.phase("detect_version"):
+            return self.find_version(archive)
 
-    def detect_version(self) -> Version:
+    def find_version(self, archive: Optional[BinaryIO] = None) -> Version:
+        """Detect the archive's version from its header, read through the given handle on it if there is one."""
+        if archive:
+            archive.seek(0)
+            header = archive.readline()
+        else:
+            with open(self.archive, "rb") as f:
+                header = f.readline()
         potential = (version() for version in self.versions)
         ext = os.path.splitext(self.archive)[1].lower()
-        with open(self.archive, "rb") as f:
-            header = f.readline()
-            detected = {version for version in potential if version.detect(ext, header)}
-            if len(detected) > 1:
-                raise AmbiguousArchiveError(detected)
-            try:
-                return next(iter(detected))
-            except StopIteration:
-                raise UnknownArchiveError(header)
+        detected = {version for version in potential if version.detect(ext, header)}
+        if len(detected) > 1:
+            raise AmbiguousArchiveError(detected)
+        try:
+            return next(iter(detected))
+        except StopIteration:
+            raise UnknownArchiveError(header)
 
     @staticmethod
     def ensure_str_path(path: Union[str, bytes]) -> str:
@@ -269,9 +799,11 @@ class UnRPA:
 
     @staticmethod
     def normalise_entry(entry: IndexEntry) -> ComplexIndexEntry:
-        return [
-            (*cast(SimpleIndexPart, part), b"")
-            if len(part) == 2
-            else cast(ComplexIndexPart, part)
-            for part in entry
-        ]
+        return [UnRPA.normalise_part(part) for part in entry]
+
+    @staticmethod
+    def normalise_part(part: IndexPart) -> ComplexIndexPart:
+        if len(part) == 2:
+            return (*cast(SimpleIndexPart, part), b"")
+        else:
+            return cast(ComplexIndexPart, part)
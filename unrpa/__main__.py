@@ -18,11 +18,20 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import contextlib
+import json
 import os
+import re
 import sys
 from typing import Tuple, Optional, Any
 
 from unrpa import UnRPA
+from unrpa.batch import BatchScheduler, perform
+from unrpa.cache import IndexCache
+from unrpa.dedupe import Deduplicator, link_modes
+from unrpa.export import ArchiveExporter, formats
+from unrpa.filters import PathFilter
+from unrpa.stats import ArchiveStats
 from unrpa.errors import UnRPAError
 from unrpa import meta
 
@@ -64,6 +73,23 @@ def main() -> None:
         dest="action",
         help="list the contents of the archive(s) in a tree view",
     )
+    action_group.add_argument(
+        "--serve",
+        action="store_const",
+        const="serve",
+        dest="action",
+        help="serve the contents of the archive over HTTP, without extracting them.",
+    )
+    action_group.add_argument(
+        "--export",
+        action="store",
+        type=str,
+        dest="export",
+        default=None,
+        metavar="OUTPUT",
+        help="write the contents of the archive(s) into a single tar or zip file, or - for stdout, without extracting "
+        "them.",
+    )
     parser.add_argument(
         "-p",
         "--path",
@@ -81,11 +107,111 @@ def main() -> None:
         default=False,
         help="will make any missing directories in the given extraction path.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        dest="jobs",
+        default=1,
+        help="extract using this many jobs in total, spread across the archives if there are several (default: 1).",
+    )
 
     parser.add_argument(
         "--version", action="version", version=f"{meta.name} {meta.version}"
     )
 
+    filtering = parser.add_argument_group(
+        title="filtering arguments",
+        description="Options to work with only some of the files in the archive(s). Paths are matched using / as the "
+        "directory separator.",
+    )
+
+    filtering.add_argument(
+        "-i",
+        "--include",
+        action="append",
+        type=str,
+        dest="include",
+        default=[],
+        metavar="GLOB",
+        help="only work with files matching this glob, can be given multiple times.",
+    )
+    filtering.add_argument(
+        "-x",
+        "--exclude",
+        action="append",
+        type=str,
+        dest="exclude",
+        default=[],
+        metavar="GLOB",
+        help="don't work with files matching this glob, can be given multiple times.",
+    )
+    filtering.add_argument(
+        "--include-regex",
+        action="append",
+        type=str,
+        dest="include_regex",
+        default=[],
+        metavar="REGEX",
+        help="only work with files matching this regular expression, can be given multiple times.",
+    )
+    filtering.add_argument(
+        "--exclude-regex",
+        action="append",
+        type=str,
+        dest="exclude_regex",
+        default=[],
+        metavar="REGEX",
+        help="don't work with files matching this regular expression, can be given multiple times.",
+    )
+    filtering.add_argument(
+        "--files-from",
+        action="store",
+        type=str,
+        dest="files_from",
+        default=None,
+        metavar="FILE",
+        help="only work with the files whose paths are listed in this file, one per line.",
+    )
+
+    serving = parser.add_argument_group(
+        title="serving arguments",
+        description="Options for serving the contents of an archive with --serve.",
+    )
+
+    serving.add_argument(
+        "--host",
+        action="store",
+        type=str,
+        dest="host",
+        default="127.0.0.1",
+        help="the address to serve on (default: 127.0.0.1).",
+    )
+    serving.add_argument(
+        "--port",
+        action="store",
+        type=int,
+        dest="port",
+        default=8000,
+        help="the port to serve on, 0 picks any free port (default: 8000).",
+    )
+
+    exporting = parser.add_argument_group(
+        title="exporting arguments",
+        description="Options for exporting the contents of archives with --export.",
+    )
+
+    exporting.add_argument(
+        "--format",
+        action="store",
+        dest="format",
+        choices=list(formats),
+        default=None,
+        help="the format to export to, zip files store rather than compress the files (default: zip if the output "
+        "ends with .zip, otherwise tar).",
+    )
+
     advanced = parser.add_argument_group(
         title="advanced arguments",
         description="Options that most users don't need, but might allow working with unsupported or damaged archives.",
@@ -98,6 +224,101 @@ def main() -> None:
         default=False,
         help="try to continue extraction when something goes wrong.",
     )
+    advanced.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=False,
+        help="keep a manifest of extracted files in the extraction path, and skip files it shows are already extracted.",
+    )
+    advanced.add_argument(
+        "--ordered",
+        action="store_true",
+        dest="ordered",
+        default=False,
+        help="extract files in the order they are stored in the archive, combining reads of nearby files.",
+    )
+    advanced.add_argument(
+        "--memory-map",
+        action="store_true",
+        dest="memory_map",
+        default=False,
+        help="memory-map the archive and copy files straight out of the mapping.",
+    )
+    advanced.add_argument(
+        "--cache-dir",
+        action="store",
+        type=str,
+        dest="cache_dir",
+        default=None,
+        help="cache archive indexes (and ZiX loader details) in this directory so unchanged archives don't need to be decoded again.",
+    )
+    advanced.add_argument(
+        "--cache-size",
+        action="store",
+        type=int,
+        dest="cache_size",
+        default=256,
+        help="the maximum size of the index cache in MiB, least recently used entries are removed first (default: 256).",
+    )
+    advanced.add_argument(
+        "--diff",
+        action="store",
+        type=str,
+        dest="diff",
+        default=None,
+        metavar="OLD",
+        help="only extract files added or changed since OLD, an earlier revision of the archive or a manifest from "
+        "--hash-manifest, and delete extracted files that have since been removed. With --list, list the changes.",
+    )
+    advanced.add_argument(
+        "--dedupe",
+        action="store",
+        dest="dedupe",
+        choices=link_modes,
+        default=None,
+        help="link files that are identical to one already extracted to it, rather than writing them again.",
+    )
+    advanced.add_argument(
+        "--hash-manifest",
+        action="store",
+        type=str,
+        dest="hash_manifest",
+        default=None,
+        metavar="FILE",
+        help="write the path, size and SHA-256 hash of each extracted file to this file, as JSON lines.",
+    )
+    advanced.add_argument(
+        "--preallocate",
+        action="store_true",
+        dest="preallocate",
+        default=False,
+        help="allocate each extracted file at its full size before writing it, where the platform supports it, "
+        "which can reduce fragmentation.",
+    )
+    advanced.add_argument(
+        "--skip-space-check",
+        action="store_false",
+        dest="check_space",
+        default=True,
+        help="don't check there is enough free space for the extracted files before extracting them.",
+    )
+    advanced.add_argument(
+        "--stats",
+        action="store",
+        dest="stats",
+        choices=["json"],
+        default=None,
+        help="after working with each archive, write how long each phase took and how much was read and written to "
+        "stderr in this format.",
+    )
+    advanced.add_argument(
+        "--trace-memory",
+        action="store_true",
+        dest="trace_memory",
+        default=False,
+        help="with --stats, also trace the peak memory used (this slows things down).",
+    )
     advanced.add_argument(
         "-f",
         "--force",
@@ -138,6 +359,9 @@ def main() -> None:
 
     args: Any = parser.parse_args()
 
+    if args.export:
+        args.action = "export"
+
     provided_version = None
     if args.version:
         try:
@@ -161,18 +385,89 @@ def main() -> None:
     if args.action and args.path:
         parser.error("Option -path: only valid when extracting.")
 
+    if args.action == "serve" and len(args.files) > 1:
+        parser.error("Option --serve: only one archive can be served at once.")
+
+    if args.format and not args.export:
+        parser.error("Option --format: only valid when --export is set.")
+
+    if args.export == "-" and sys.stdout.isatty():
+        parser.error("Option --export: won't write an archive to a terminal.")
+
     if args.mkdir and not args.path:
         parser.error("Option --mkdir: only valid when --path is set.")
 
+    if args.jobs < 1:
+        parser.error("Option --jobs: must be at least 1.")
+
+    if (args.dedupe or args.hash_manifest) and args.action:
+        parser.error("Options --dedupe and --hash-manifest: only valid when extracting.")
+
+    if (args.preallocate or not args.check_space) and args.action:
+        parser.error(
+            "Options --preallocate and --skip-space-check: only valid when extracting."
+        )
+
+    if args.diff and args.action in ("tree", "serve", "export"):
+        parser.error("Option --diff: only valid when extracting or listing.")
+
+    if args.diff and len(args.files) > 1:
+        parser.error("Option --diff: only one archive can be compared at once.")
+
+    if args.diff and not os.path.isfile(args.diff):
+        parser.error(f"No such file: “{args.diff}”.")
+
+    if args.trace_memory and not args.stats:
+        parser.error("Option --trace-memory: only valid when --stats is set.")
+
     if not args.mkdir and args.path and not os.path.isdir(args.path):
         parser.error(f"No such directory: “{args.path}”. Use --mkdir to create it.")
 
+    path_filter = None
+    if (
+        args.include
+        or args.exclude
+        or args.include_regex
+        or args.exclude_regex
+        or args.files_from
+    ):
+        try:
+            include = [PathFilter.glob(glob) for glob in args.include] + [
+                PathFilter.regex(regex) for regex in args.include_regex
+            ]
+            exclude = [PathFilter.glob(glob) for glob in args.exclude] + [
+                PathFilter.regex(regex) for regex in args.exclude_regex
+            ]
+        except re.error as error:
+            parser.error(f"Invalid regular expression: {error}.")
+        paths = None
+        if args.files_from:
+            try:
+                with open(args.files_from, "r", encoding="utf-8") as files_from:
+                    paths = PathFilter.read_paths(files_from)
+            except OSError as error:
+                parser.error(f"Could not read “{args.files_from}”: {error.strerror}.")
+        path_filter = PathFilter(include, exclude, paths)
+
+    cache = (
+        IndexCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        if args.cache_dir
+        else None
+    )
+
+    deduplicator = (
+        Deduplicator(args.dedupe, args.hash_manifest)
+        if args.dedupe or args.hash_manifest
+        else None
+    )
+
+    extractors = []
     for filename in args.files:
         if not os.path.isfile(filename):
             parser.error(f"No such file: “{filename}”.")
 
-        try:
-            extractor = UnRPA(
+        extractors.append(
+            UnRPA(
                 filename,
                 args.verbose,
                 args.path,
@@ -180,16 +475,72 @@ def main() -> None:
                 provided_version,
                 args.continue_on_error,
                 provided_offset_and_key,
+                workers=args.jobs,
+                memory_map=args.memory_map,
+                cache=cache,
+                path_filter=path_filter,
+                ordered=args.ordered,
+                resume=args.resume,
+                stats=ArchiveStats(args.trace_memory) if args.stats else None,
+                deduplicator=deduplicator,
+                diff_base=args.diff,
+                preallocate=args.preallocate,
+                check_space=args.check_space,
+            )
+        )
+
+    # Deduplicating across archives needs them all extracted in this process.
+    if (
+        not args.action
+        and args.jobs > 1
+        and len(extractors) > 1
+        and not deduplicator
+    ):
+        errors = BatchScheduler(args.jobs).run(extractors)
+        for extractor in extractors:
+            report_stats(extractor, args.action)
+        if errors:
+            sys.exit(
+                "".join(
+                    error_message(f"{archive}: {message}", cmd_line_help)
+                    for archive, message, cmd_line_help in errors
+                )
             )
-            if args.action == "list":
-                extractor.list_files()
-            elif args.action == "tree":
-                extractor.list_files_tree()
-            else:
-                extractor.extract_files()
-        except UnRPAError as error:
-            help_message = f"\n{error.cmd_line_help}" if error.cmd_line_help else ""
-            sys.exit(f"\n\033[31m{error.message}{help_message}\033[30m")
+    else:
+        exporter = (
+            ArchiveExporter.for_path(args.export, args.format) if args.export else None
+        )
+        failed = False
+        with exporter if exporter else contextlib.nullcontext():
+            for extractor in extractors:
+                try:
+                    if args.action == "serve":
+                        extractor.serve(args.host, args.port)
+                    elif exporter:
+                        failed |= bool(extractor.export(exporter))
+                    else:
+                        failed |= bool(perform(extractor, args.action))
+                except UnRPAError as error:
+                    sys.exit(error_message(error.message, error.cmd_line_help))
+                report_stats(extractor, args.action)
+        if failed:
+            # The failures have already been reported, but anything running this needs to know some files are missing.
+            sys.exit(1)
+
+
+def report_stats(extractor: UnRPA, action: Optional[str]) -> None:
+    if extractor.stats:
+        stats = {
+            "archive": extractor.archive,
+            "action": action or "extract",
+            **extractor.stats.as_dict(),
+        }
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def error_message(message: str, cmd_line_help: Optional[str]) -> str:
+    help_message = f"\n{cmd_line_help}" if cmd_line_help else ""
+    return f"\n\033[31m{message}{help_message}\033[30m"
 
 
 if __name__ == "__main__":
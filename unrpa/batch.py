@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Tuple, Sequence
+
+from unrpa import UnRPA
+from unrpa.errors import UnRPAError
+from unrpa.stats import ArchiveStats
+
+# Archive, Message, Command Line Help
+BatchError = Tuple[str, str, Optional[str]]
+
+
+def perform(extractor: UnRPA, action: Optional[str]) -> List[Tuple[str, str]]:
+    """Perform the given action (list, tree, or extract if none) on an archive, returning any files that failed."""
+    if action == "list":
+        extractor.list_files()
+    elif action == "tree":
+        extractor.list_files_tree()
+    else:
+        return extractor.extract_files()
+    return []
+
+
+def attempt(
+    extractor: UnRPA, action: Optional[str]
+) -> Tuple[Optional[BatchError], Optional[ArchiveStats]]:
+    """Perform an action, returning any error and the stats collected in a form that can be passed back from another
+    process."""
+    try:
+        failures = perform(extractor, action)
+        if failures:
+            return (
+                (extractor.archive, f"Failed to extract {len(failures)} file(s).", None),
+                extractor.stats,
+            )
+        return None, extractor.stats
+    except UnRPAError as error:
+        return (extractor.archive, error.message, error.cmd_line_help), extractor.stats
+
+
+class BatchScheduler:
+    """Extracts many archives at once on a pool of processes.
+
+    The given number of jobs is a limit on concurrency for the whole batch: it is split between the processes, with
+    each archive extracted using its share as worker threads. Archives are started largest first so a big archive
+    doesn't end up running alone at the end.
+    """
+
+    def __init__(self, jobs: int) -> None:
+        self.jobs = max(1, jobs)
+
+    def run(self, extractors: Sequence[UnRPA]) -> List[BatchError]:
+        ordered = sorted(
+            extractors,
+            key=lambda extractor: os.path.getsize(extractor.archive),
+            reverse=True,
+        )
+        processes = min(self.jobs, len(ordered))
+        for extractor in ordered:
+            extractor.workers = max(1, self.jobs // processes)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {
+                id(extractor): executor.submit(attempt, extractor, None)
+                for extractor in ordered
+            }
+            errors = []
+            for extractor in extractors:
+                error, extractor.stats = futures[id(extractor)].result()
+                if error:
+                    errors.append(error)
+        return errors
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Optional, Tuple, List
+
+from unrpa.index import CompactIndex
+
+
+class IndexCache:
+    """A persistent on-disk cache of normalised archive indexes.
+
+    Entries are keyed by the archive's path, size, modification time and inode, along with anything that overrides how
+    the index is found, so a changed archive is never served a stale index. When the cache grows beyond its size limit,
+    the least recently used entries are evicted.
+    """
+
+    magic = b"UNRPA-INDEX\x02"
+    suffix = ".idx"
+
+    count_format = struct.Struct("<Q")
+
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024) -> None:
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+
+    def key(
+        self,
+        archive: str,
+        version: Optional[str] = None,
+        offset_and_key: Optional[Tuple[int, int]] = None,
+    ) -> str:
+        path = os.path.abspath(archive)
+        stat = os.stat(path)
+        identity = (
+            path,
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+            version,
+            offset_and_key,
+        )
+        return hashlib.sha256(repr(identity).encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[CompactIndex]:
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            index = IndexCache.decode(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error):
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return index
+
+    def store(self, key: str, index: CompactIndex) -> None:
+        """Store an index, if possible: the cache is only an optimisation, so failing to write to it isn't an error."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(
+                suffix=".tmp", dir=self.directory, prefix=key
+            )
+        except OSError:
+            return
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(IndexCache.encode(index))
+            os.replace(temporary, self.entry_path(key))
+        except OSError:
+            self.remove(temporary)
+            return
+        except BaseException:
+            self.remove(temporary)
+            raise
+        try:
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in its size limit."""
+        entries: List[Tuple[int, int, str]] = []
+        for name in os.listdir(self.directory):
+            if name.endswith(IndexCache.suffix):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.remove(path)
+            total -= size
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + IndexCache.suffix)
+
+    @staticmethod
+    def remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def encode(index: CompactIndex) -> bytes:
+        paths = [path.encode("utf-8", "surrogateescape") for path in index.paths]
+        path_bounds = array("Q", [0])
+        for path in paths:
+            path_bounds.append(path_bounds[-1] + len(path))
+        columns = [index.offsets, index.lengths, index.prefix_bounds, path_bounds]
+        if sys.byteorder != "little":
+            columns = [IndexCache.swapped(column) for column in columns]
+        return b"".join(
+            [
+                IndexCache.magic,
+                IndexCache.count_format.pack(len(paths)),
+                *(column.tobytes() for column in columns),
+                IndexCache.count_format.pack(len(index.prefixes)),
+                index.prefixes,
+                *paths,
+            ]
+        )
+
+    @staticmethod
+    def decode(data: bytes) -> CompactIndex:
+        if not data.startswith(IndexCache.magic):
+            raise ValueError("Not an index cache entry.")
+        count = IndexCache.count_format
+        position = len(IndexCache.magic)
+        (total,) = count.unpack_from(data, position)
+        position += count.size
+        columns = []
+        for size in (total, total, total + 1, total + 1):
+            column = array("Q")
+            end = position + size * column.itemsize
+            column.frombytes(data[position:end])
+            position = end
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns.append(column)
+        offsets, lengths, prefix_bounds, path_bounds = columns
+        (prefixes_size,) = count.unpack_from(data, position)
+        position += count.size
+        prefixes = data[position : position + prefixes_size]
+        position += prefixes_size
+        paths = data[position:]
+        if len(paths) != path_bounds[-1] or len(prefixes) != prefix_bounds[-1]:
+            raise ValueError("Truncated index cache entry.")
+        return CompactIndex(
+            [
+                sys.intern(paths[start:end].decode("utf-8", "surrogateescape"))
+                for start, end in zip(path_bounds, path_bounds[1:])
+            ],
+            offsets,
+            lengths,
+            prefix_bounds,
+            prefixes,
+        )
+
+    @staticmethod
+    def swapped(column: "array[int]") -> "array[int]":
+        column = array(column.typecode, column)
+        column.byteswap()
+        return column
@@ -0,0 +1,196 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Tuple, Optional, List, BinaryIO, cast
+
+from unrpa.index import ComplexIndexPart
+from unrpa.versions.version import Version
+from unrpa.view import ArchiveView
+
+# Size, SHA-256
+Content = Tuple[int, str]
+# Archive, Offset, Length, Prefix
+Identity = Tuple[str, int, int, bytes]
+
+# The ioctl to make a copy-on-write clone of a file on Linux (for btrfs, XFS and others that support it).
+FICLONE = 0x40049409
+
+link_modes = ("hardlink", "reflink")
+
+
+def open_output_file(path: str) -> BinaryIO:
+    """Open a new file to write to at the given path, replacing any existing file rather than writing into it.
+
+    An existing file may be a hard link shared with other files (from deduplicating an earlier extraction), so
+    truncating it would change them too.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return open(path, "wb")
+
+
+def reflink(source: str, destination: str) -> bool:
+    """Make the destination a copy-on-write clone of the source, if the platform and filesystem support it."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        try:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+            return True
+        except OSError:
+            return False
+
+
+class HashingSink(io.RawIOBase):
+    """A file to postprocess an entry into that hashes the data as it is written.
+
+    Data is held in memory until there is more than buffer_limit bytes of it, so small files that turn out to be
+    duplicates never need writing at all.
+    """
+
+    def __init__(self, path: str, buffer_limit: int) -> None:
+        self.path = path
+        self.buffer_limit = buffer_limit
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.buffered: List[bytes] = []
+        self.file: Optional[BinaryIO] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore
+        self.hash.update(data)
+        self.size += len(data)
+        if self.file:
+            self.file.write(data)
+        else:
+            # The data may be a view onto a buffer that is about to be reused, so it has to be copied.
+            self.buffered.append(bytes(data))
+            if self.size > self.buffer_limit:
+                self.materialise()
+        return len(data)
+
+    def materialise(self) -> None:
+        """Make sure everything written so far is in the file."""
+        if not self.file:
+            self.file = open_output_file(self.path)
+            for data in self.buffered:
+                self.file.write(data)
+            self.buffered = []
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+        super().close()
+
+    def content(self) -> Content:
+        return self.size, self.hash.hexdigest()
+
+
+class Deduplicator:
+    """Hashes files as they are extracted, linking duplicates to the first copy rather than writing them again.
+
+    Entries that point at exactly the same data in an archive aren't read again at all, and otherwise files are
+    compared by their size and SHA-256 hash, including against files extracted from earlier archives. Duplicates are
+    hard linked or reflinked, depending on the link mode, falling back to a copy of the first file if that isn't
+    possible. With no link mode, files are just hashed. Either way, the sizes and hashes of the extracted files can be
+    saved as a manifest.
+    """
+
+    buffer_limit = 1024 * 1024
+
+    def __init__(
+        self, link: Optional[str] = "hardlink", manifest: Optional[str] = None
+    ) -> None:
+        if link is not None and link not in link_modes:
+            raise ValueError(f"Unknown link mode: {link}.")
+        self.link = link
+        self.manifest = manifest
+        self.by_identity: Dict[Identity, Tuple[str, Content]] = {}
+        self.by_content: Dict[Content, str] = {}
+        self.records: Dict[str, Content] = {}
+        self.lock = threading.Lock()
+
+    def write(
+        self,
+        archive: str,
+        version: Version,
+        source: ArchiveView,
+        part: ComplexIndexPart,
+        path: str,
+    ) -> Content:
+        """Write an entry to the given path, unless it is a duplicate, in which case it is linked instead."""
+        with self.lock:
+            alias = self.by_identity.get((archive, *part))
+        if alias:
+            first, content = alias
+            self.place(first, path)
+            return content
+        with HashingSink(path, Deduplicator.buffer_limit) as sink:
+            version.postprocess(source, cast(BinaryIO, sink))
+            content = sink.content()
+            with self.lock:
+                existing = self.by_content.get(content)
+            if existing and self.link:
+                sink.close()
+                self.place(existing, path)
+            else:
+                sink.materialise()
+        return content
+
+    def register(
+        self,
+        archive: str,
+        part: ComplexIndexPart,
+        name: str,
+        path: str,
+        content: Content,
+    ) -> None:
+        """Record a file once it is in its final place, so later duplicates can be linked to it."""
+        with self.lock:
+            self.by_identity.setdefault((archive, *part), (path, content))
+            self.by_content.setdefault(content, path)
+            self.records[name.replace(os.sep, "/")] = content
+
+    def place(self, source: str, destination: str) -> None:
+        if source == destination:
+            return
+        if os.path.lexists(destination):
+            os.remove(destination)
+        if self.link == "hardlink":
+            try:
+                os.link(source, destination)
+                return
+            except OSError:
+                pass
+        elif self.link == "reflink" and reflink(source, destination):
+            return
+        shutil.copyfile(source, destination)
+
+    def save(self) -> None:
+        """Write the manifest of the extracted files' sizes and hashes, if there is one."""
+        if not self.manifest:
+            return
+        directory = os.path.dirname(os.path.abspath(self.manifest))
+        descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                with self.lock:
+                    records = sorted(self.records.items())
+                for name, (size, digest) in records:
+                    line = json.dumps({"path": name, "size": size, "sha256": digest})
+                    file.write(f"{line}\n")
+            os.replace(temporary, self.manifest)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
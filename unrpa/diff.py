@@ -0,0 +1,152 @@
+import copy
+import hashlib
+import io
+import json
+import os
+from typing import List, Dict, Iterator, Optional, TYPE_CHECKING
+
+from unrpa.dedupe import Content
+
+if TYPE_CHECKING:
+    from unrpa.session import ArchiveSession
+
+compare_size = 1024 * 1024
+
+
+def same_contents(old_file: io.BufferedIOBase, new_file: io.BufferedIOBase) -> bool:
+    """If two files have exactly the same contents, reading them in step so the first difference ends the comparison."""
+    while True:
+        old_data = old_file.read(compare_size)
+        if old_data != new_file.read(compare_size):
+            return False
+        if not old_data:
+            return True
+
+
+def full_hash(file: io.BufferedIOBase) -> str:
+    digest = hashlib.sha256()
+    for data in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def read_hash_manifest(path: str) -> Optional[Dict[str, Content]]:
+    """Read a manifest of file hashes (see Deduplicator), or None if the file isn't one."""
+    with open(path, "rb") as file:
+        if file.read(1) not in (b"{", b""):
+            return None
+    records = {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                records[record["path"]] = (record["size"], record["sha256"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    return records
+
+
+class ArchiveDiff:
+    """The differences between the files in an archive and an earlier revision of it.
+
+    The earlier revision can be the old archive, or a manifest of the hashes of the files extracted from it, in which
+    case files of the same size are hashed in full to compare against it. Against the old archive, files of the same
+    size are compared in full, stopping at the first difference. Paths are in the form used by the index.
+    """
+
+    def __init__(
+        self, added: List[str], removed: List[str], changed: List[str], unchanged: int
+    ) -> None:
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+
+    @staticmethod
+    def compare(session: "ArchiveSession", base: str) -> "ArchiveDiff":
+        records = read_hash_manifest(base)
+        if records is not None:
+            return ArchiveDiff.against_manifest(session, records)
+        old = copy.copy(session.extractor)
+        old.archive = base
+        old.offset_and_key = None
+        with old.session() as old_session:
+            return ArchiveDiff.between(old_session, session)
+
+    @staticmethod
+    def between(
+        old_session: "ArchiveSession", session: "ArchiveSession"
+    ) -> "ArchiveDiff":
+        diff = ArchiveDiff([], [], [], 0)
+        old_rows = old_session.get_index().rows()
+        old_row = next(old_rows, None)
+        for path, part in session.get_index().rows():
+            # Both indexes are in path order, so they can be walked together.
+            while old_row is not None and old_row[0] < path:
+                diff.removed.append(old_row[0])
+                old_row = next(old_rows, None)
+            if old_row is None or old_row[0] != path:
+                diff.added.append(path)
+                continue
+            _, old_part = old_row
+            old_row = next(old_rows, None)
+            if part[1] != old_part[1]:
+                diff.changed.append(path)
+                continue
+            old_file = old_session.member_file(old_part)
+            new_file = session.member_file(part)
+            if not same_contents(old_file, new_file):
+                diff.changed.append(path)
+            else:
+                diff.unchanged += 1
+        while old_row is not None:
+            diff.removed.append(old_row[0])
+            old_row = next(old_rows, None)
+        return diff
+
+    @staticmethod
+    def against_manifest(
+        session: "ArchiveSession", records: Dict[str, Content]
+    ) -> "ArchiveDiff":
+        diff = ArchiveDiff([], [], [], 0)
+        seen = set()
+        for path, part in session.get_index().rows():
+            name = path.replace(os.sep, "/")
+            seen.add(name)
+            record = records.get(name)
+            if record is None:
+                diff.added.append(path)
+                continue
+            size, digest = record
+            if size != part[1]:
+                diff.changed.append(path)
+            elif full_hash(session.member_file(part)) != digest:
+                diff.changed.append(path)
+            else:
+                diff.unchanged += 1
+        path_filter = session.extractor.path_filter
+        diff.removed = sorted(
+            name.replace("/", os.sep)
+            for name in records
+            if name not in seen and (not path_filter or path_filter.matches(name))
+        )
+        return diff
+
+    def to_extract(self) -> List[str]:
+        return sorted(self.added + self.changed)
+
+    def lines(self) -> Iterator[str]:
+        """The changes as lines, marked A for added, M for modified and D for deleted, in path order."""
+        marked = (
+            [(path, "A") for path in self.added]
+            + [(path, "M") for path in self.changed]
+            + [(path, "D") for path in self.removed]
+        )
+        for path, mark in sorted(marked):
+            yield f"{mark} {path}"
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed and "
+            f"{self.unchanged} unchanged."
+        )
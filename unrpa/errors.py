@@ -1,4 +1,4 @@
-from typing import Set, Optional
+from typing import Set, Optional, Iterable, Type
 
 from unrpa.versions.version import Version
 
@@ -59,3 +59,64 @@ class ErrorExtractingFile(UnRPAError):
             "If you wish to try and extract as much from the archive as possible, please use --continue-on-error.\n"
             f"Error Detail: {detail}",
         )
+
+
+class InvalidKeyError(UnRPAError):
+    """An error for when the key an index is obfuscated with is outside the range an offset or length could be XORed with."""
+
+    def __init__(self, key: int) -> None:
+        self.key = key
+        super().__init__(
+            f"The key {key} can't be used to deobfuscate the archive's index, as keys must be between 0 and 2^64 - 1.",
+            "If you gave the key with --key, check it is correct, otherwise the archive may be a version that isn't "
+            "supported yet.",
+        )
+
+
+class MemberNotFoundError(UnRPAError):
+    """An error for when a file that was asked for isn’t in the archive."""
+
+    def __init__(self, archive: str, member: str) -> None:
+        self.member = member
+        super().__init__(
+            f"There is no file “{member}” in the archive {archive}.",
+            "You can use --list to see the files in the archive.",
+        )
+
+
+class PackingNotSupportedError(UnRPAError):
+    """An error for when an archive is to be written in a version that can't be written."""
+
+    def __init__(
+        self, version: Type[Version], supported: Iterable[Type[Version]]
+    ) -> None:
+        self.version = version
+        supported_list = ", ".join(supported_version.name for supported_version in supported)
+        super().__init__(
+            f"Archives can't be written as {version.name}, only as one of: {supported_list}."
+        )
+
+
+class UnsafeIndexError(UnRPAError):
+    """An error for when an archive's index refers to something an index never should, which could run code."""
+
+    def __init__(self, module: str, name: str) -> None:
+        self.module = module
+        self.name = name
+        super().__init__(
+            f"The archive's index refers to “{module}.{name}”, which an index should never need, so it was not loaded.",
+            "The archive may be malicious, or may be a version that isn't supported yet.",
+        )
+
+
+class NotEnoughSpaceError(UnRPAError):
+    """An error for when the files to be extracted won't fit in the free space where they are being extracted to."""
+
+    def __init__(self, path: str, needed: int, free: int) -> None:
+        self.needed = needed
+        self.free = free
+        super().__init__(
+            f"Extracting needs {needed} bytes, but there are only {free} bytes free at {path}.",
+            "Free up some space, extract fewer files with --include or --exclude, or if files already extracted "
+            "there will be replaced, use --skip-space-check.",
+        )
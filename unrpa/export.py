@@ -0,0 +1,175 @@
+import io
+import sys
+import tarfile
+import time
+import zipfile
+from abc import ABCMeta, abstractmethod
+from types import TracebackType
+from typing import BinaryIO, Callable, Optional, Type, Dict, Set, cast
+
+from unrpa.output import AtomicOutput
+
+# Sink -> None
+MemberWriter = Callable[[BinaryIO], None]
+
+
+class SizedSink(io.RawIOBase):
+    """Passes data on to the output, keeping track of how much has been written."""
+
+    def __init__(self, output: BinaryIO) -> None:
+        self.output = output
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore
+        self.output.write(data)
+        self.written += len(data)
+        return len(data)
+
+
+class ArchiveExporter(metaclass=ABCMeta):
+    """Writes files from archives into another kind of archive, as a single stream.
+
+    Each file's data is written straight into the output as it is read from the archive, so nothing touches the
+    filesystem and whole files are never held in memory. As the output is a stream, the size of each file must be known
+    before it is written. When writing to a file, the output is written to a temporary file alongside it, and only moved
+    into place once complete. If several archives have a file with the same name, only the first is exported, as that
+    is the one Ren'Py would load.
+    """
+
+    buffer_size = 1024 * 1024
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.names: Set[str] = set()
+        if path == "-":
+            self.atomic: Optional[AtomicOutput] = None
+            self.output = cast(BinaryIO, sys.stdout.buffer)
+        else:
+            self.atomic = AtomicOutput(path)
+            output = open(self.atomic.temporary, "wb", self.buffer_size)
+            self.output = cast(BinaryIO, output)
+
+    @staticmethod
+    def for_path(path: str, format: Optional[str] = None) -> "ArchiveExporter":
+        """An exporter for the given path (or - for stdout), in the given format or the one its extension suggests."""
+        if not format:
+            format = "zip" if path.lower().endswith(".zip") else "tar"
+        return formats[format](path)
+
+    def __enter__(self) -> "ArchiveExporter":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close(complete=exception is None)
+
+    def add(self, name: str, size: int, mtime: float, write: MemberWriter) -> bool:
+        """Add a file, whose data the given function writes to the sink it is given, which must be exactly size bytes.
+
+        Returns if the file was added, rather than skipped because a file with the same name already was.
+        """
+        if name in self.names:
+            return False
+        self.names.add(name)
+        self.add_member(name, size, mtime, write)
+        return True
+
+    @abstractmethod
+    def add_member(
+        self, name: str, size: int, mtime: float, write: MemberWriter
+    ) -> None:
+        raise NotImplementedError()
+
+    def finish(self) -> None:
+        """Write anything that has to come after the last file."""
+
+    def close(self, complete: bool = True) -> None:
+        try:
+            if complete:
+                self.finish()
+            self.output.flush()
+        finally:
+            if self.atomic:
+                self.output.close()
+                if complete:
+                    self.atomic.finish()
+                else:
+                    self.atomic.discard()
+
+    @staticmethod
+    def write_member(
+        name: str, size: int, write: MemberWriter, sink: BinaryIO
+    ) -> None:
+        sized = SizedSink(sink)
+        write(cast(BinaryIO, sized))
+        if sized.written != size:
+            raise Exception(
+                f"“{name}” should be {size} bytes, but was {sized.written} bytes when exported."
+            )
+
+
+class TarExporter(ArchiveExporter):
+    """Exports to an uncompressed tar file."""
+
+    padding = bytes(tarfile.BLOCKSIZE)
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.position = 0
+
+    def add_member(
+        self, name: str, size: int, mtime: float, write: MemberWriter
+    ) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        self.output.write(header)
+        ArchiveExporter.write_member(name, size, write, self.output)
+        self.position += len(header) + size
+        self.write_padding(tarfile.BLOCKSIZE)
+
+    def finish(self) -> None:
+        self.output.write(self.padding * 2)
+        self.position += tarfile.BLOCKSIZE * 2
+        self.write_padding(tarfile.RECORDSIZE)
+
+    def write_padding(self, multiple: int) -> None:
+        remainder = self.position % multiple
+        if remainder:
+            self.output.write(bytes(multiple - remainder))
+            self.position += multiple - remainder
+
+
+class ZipExporter(ArchiveExporter):
+    """Exports to a zip file, with the files stored rather than compressed."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.zip = zipfile.ZipFile(self.output, "w", zipfile.ZIP_STORED)
+
+    def add_member(
+        self, name: str, size: int, mtime: float, write: MemberWriter
+    ) -> None:
+        # Zip files can't hold times before 1980.
+        date_time = max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
+        info = zipfile.ZipInfo(name, date_time)
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        info.file_size = size
+        with self.zip.open(info, "w") as sink:
+            ArchiveExporter.write_member(name, size, write, cast(BinaryIO, sink))
+
+    def finish(self) -> None:
+        self.zip.close()
+
+
+formats: Dict[str, Type[ArchiveExporter]] = {"tar": TarExporter, "zip": ZipExporter}
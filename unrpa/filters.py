@@ -0,0 +1,55 @@
+import fnmatch
+import os
+import re
+from typing import Pattern, Sequence, Optional, AbstractSet, Iterable
+
+
+class PathFilter:
+    """Selects paths from an archive's index by include and exclude patterns.
+
+    Paths are matched with forward slashes as the separator on every platform. A path is selected if it matches any
+    include pattern or is in the given set of paths (or there are no includes at all), and doesn't match any exclude
+    pattern.
+    """
+
+    def __init__(
+        self,
+        include: Sequence[Pattern[str]] = (),
+        exclude: Sequence[Pattern[str]] = (),
+        paths: Optional[AbstractSet[str]] = None,
+    ) -> None:
+        self.include = include
+        self.exclude = exclude
+        self.paths = paths
+
+    @staticmethod
+    def glob(pattern: str) -> Pattern[str]:
+        """A pattern matching whole paths against a shell-style glob, where * also matches across directories."""
+        return re.compile(fnmatch.translate(pattern))
+
+    @staticmethod
+    def regex(pattern: str) -> Pattern[str]:
+        """A pattern matching paths that contain a match for the regular expression anywhere."""
+        expression = re.compile(pattern)
+        return re.compile(f".*?(?:{expression.pattern})", expression.flags | re.DOTALL)
+
+    @staticmethod
+    def read_paths(lines: Iterable[str]) -> AbstractSet[str]:
+        """Read a set of exact paths, one per line, ignoring blank lines."""
+        return frozenset(
+            PathFilter.normalise(line.strip()) for line in lines if line.strip()
+        )
+
+    @staticmethod
+    def normalise(path: str) -> str:
+        return path.replace(os.sep, "/")
+
+    def matches(self, path: str) -> bool:
+        path = PathFilter.normalise(path)
+        if self.include or self.paths is not None:
+            included = (self.paths is not None and path in self.paths) or any(
+                pattern.match(path) for pattern in self.include
+            )
+            if not included:
+                return False
+        return not any(pattern.match(path) for pattern in self.exclude)
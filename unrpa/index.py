@@ -0,0 +1,188 @@
+import bisect
+import io
+import operator
+import sys
+import time
+import zlib
+from array import array
+from typing import (
+    BinaryIO,
+    Tuple,
+    Iterable,
+    Union,
+    List,
+    Mapping,
+    Iterator,
+    Callable,
+    Any,
+    TYPE_CHECKING,
+)
+
+from unrpa.errors import InvalidKeyError
+
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
+
+# Offset, Length
+SimpleIndexPart = Tuple[int, int]
+SimpleIndexEntry = Iterable[SimpleIndexPart]
+# Offset, Length, Prefix
+ComplexIndexPart = Tuple[int, int, bytes]
+ComplexIndexEntry = Iterable[ComplexIndexPart]
+IndexPart = Union[SimpleIndexPart, ComplexIndexPart]
+IndexEntry = Iterable[IndexPart]
+
+
+class CompressedIndexStream(io.RawIOBase):
+    """A readable stream of the zlib-compressed index starting at the archive's current position.
+
+    The compressed data is read and decompressed in fixed size chunks, and reading stops at the end of the zlib stream,
+    so any trailing data in the archive is never read and only a bounded amount of the index is held at once. The amount
+    of compressed data read and the time spent decompressing it are kept track of as it goes.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, archive: BinaryIO):
+        self.archive = archive
+        self.decompressor = zlib.decompressobj()
+        self.compressed_size = 0
+        self.decompression_time = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: "WriteableBuffer") -> int:
+        view = memoryview(buffer).cast("B")
+        while not self.decompressor.eof:
+            compressed = self.decompressor.unconsumed_tail
+            if not compressed:
+                compressed = self.archive.read(self.chunk_size)
+                self.compressed_size += len(compressed)
+            start = time.perf_counter()
+            decompressed = self.decompressor.decompress(compressed, len(view))
+            self.decompression_time += time.perf_counter() - start
+            if decompressed:
+                view[: len(decompressed)] = decompressed
+                return len(decompressed)
+            if not compressed:
+                raise zlib.error(
+                    "Error -5 while decompressing data: incomplete or truncated stream"
+                )
+        return 0
+
+
+class CompactIndex(Mapping[str, ComplexIndexEntry]):
+    """A compact, read-only index of the files in an archive.
+
+    Rather than a dictionary of lists of tuples, the paths are kept in a single sorted table, the offsets and lengths
+    in arrays of 64-bit integers, and the prefixes in one shared blob, which takes a fraction of the memory for large
+    archives. Only the first part of each entry is kept, as that is all extraction uses.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        offsets: "array[int]",
+        lengths: "array[int]",
+        prefix_bounds: "array[int]",
+        prefixes: bytes,
+    ) -> None:
+        self.paths = paths
+        self.offsets = offsets
+        self.lengths = lengths
+        self.prefix_bounds = prefix_bounds
+        self.prefixes = prefixes
+
+    @staticmethod
+    def build(entries: Iterable[Tuple[str, ComplexIndexPart]]) -> "CompactIndex":
+        """Build an index from paths and parts, where later parts for the same path replace earlier ones."""
+        paths: List[str] = []
+        offsets = array("Q")
+        lengths = array("Q")
+        prefix_bounds = array("Q", [0])
+        prefixes = bytearray()
+        for path, (offset, length, prefix) in sorted(
+            entries, key=operator.itemgetter(0)
+        ):
+            if paths and paths[-1] == path:
+                paths.pop()
+                offsets.pop()
+                lengths.pop()
+                prefix_bounds.pop()
+                del prefixes[prefix_bounds[-1] :]
+            paths.append(sys.intern(path))
+            offsets.append(offset)
+            lengths.append(length)
+            prefixes += prefix
+            prefix_bounds.append(len(prefixes))
+        return CompactIndex(paths, offsets, lengths, prefix_bounds, bytes(prefixes))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __contains__(self, path: Any) -> bool:
+        try:
+            self.row(path)
+            return True
+        except KeyError:
+            return False
+
+    def __getitem__(self, path: str) -> ComplexIndexEntry:
+        return [self.part(self.row(path))]
+
+    def row(self, path: str) -> int:
+        row = bisect.bisect_left(self.paths, path)
+        if row < len(self.paths) and self.paths[row] == path:
+            return row
+        raise KeyError(path)
+
+    def part(self, row: int) -> ComplexIndexPart:
+        prefix = self.prefixes[self.prefix_bounds[row] : self.prefix_bounds[row + 1]]
+        return self.offsets[row], self.lengths[row], prefix
+
+    def rows(self) -> Iterator[Tuple[str, ComplexIndexPart]]:
+        """The paths and parts in the index, in path order."""
+        offsets = self.offsets
+        lengths = self.lengths
+        bounds = self.prefix_bounds
+        prefixes = self.prefixes
+        for row, path in enumerate(self.paths):
+            prefix = prefixes[bounds[row] : bounds[row + 1]]
+            yield path, (offsets[row], lengths[row], prefix)
+
+    def in_offset_order(self) -> Iterator[Tuple[str, ComplexIndexPart]]:
+        """The paths and parts in the index, in the order the data is stored in the archive."""
+        for row in sorted(range(len(self.paths)), key=self.offsets.__getitem__):
+            yield self.paths[row], self.part(row)
+
+    def filter(
+        self, predicate: Callable[[str, ComplexIndexPart], bool]
+    ) -> "CompactIndex":
+        """A new index with only the entries the predicate is true for."""
+        return CompactIndex.build(
+            (path, part) for path, part in self.rows() if predicate(path, part)
+        )
+
+    def deobfuscate(self, key: int) -> None:
+        """XOR every offset and length with the given key, in place."""
+        self.offsets = CompactIndex.xor_column(self.offsets, key)
+        self.lengths = CompactIndex.xor_column(self.lengths, key)
+
+    @staticmethod
+    def xor_column(column: "array[int]", key: int) -> "array[int]":
+        """XOR every value in the column with the key as a single operation on the whole column."""
+        if not 0 <= key < 1 << (column.itemsize * 8):
+            raise InvalidKeyError(key)
+        if not column:
+            return column
+        size = len(column) * column.itemsize
+        values = int.from_bytes(column.tobytes(), "little")
+        pattern = key.to_bytes(column.itemsize, sys.byteorder) * len(column)
+        keys = int.from_bytes(pattern, "little")
+        result = array(column.typecode)
+        result.frombytes((values ^ keys).to_bytes(size, "little"))
+        return result
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from typing import Dict, Tuple, Optional, TextIO, Any
+
+from unrpa.index import ComplexIndexEntry
+
+# Offset, Length, Prefix Length, Size Written
+ManifestRecord = Tuple[int, int, int, int]
+
+
+def identity(data: ComplexIndexEntry) -> Tuple[int, int, int]:
+    offset, length, prefix = next(iter(data))
+    return offset, length, len(prefix)
+
+
+class ExtractionManifest:
+    """A record of the files that have been completely extracted from an archive.
+
+    Each file is recorded as soon as it has been written, so if extraction is interrupted, a later extraction into the
+    same place can skip the files that were already finished.
+    """
+
+    suffix = ".unrpa-manifest"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records: Dict[str, ManifestRecord] = {}
+        self.lock = threading.Lock()
+        self.file: Optional[TextIO] = None
+
+    @staticmethod
+    def for_archive(output: str, archive: str) -> "ExtractionManifest":
+        """The manifest for extracting the given archive into the given output directory."""
+        name = f".{os.path.basename(archive)}{ExtractionManifest.suffix}"
+        return ExtractionManifest(os.path.join(output, name))
+
+    def __enter__(self) -> "ExtractionManifest":
+        self.load()
+        self.file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        self.records[record["path"]] = (
+                            record["offset"],
+                            record["length"],
+                            record["prefix_length"],
+                            record["size"],
+                        )
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by an interruption, just extract the file again.
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def is_complete(self, path: str, data: ComplexIndexEntry, output: str) -> bool:
+        """If the given file has already been completely extracted from this entry."""
+        record = self.records.get(path)
+        if record is None or record[:3] != identity(data):
+            return False
+        try:
+            return os.path.getsize(output) == record[3]
+        except OSError:
+            return False
+
+    def record(self, path: str, data: ComplexIndexEntry, size: int) -> None:
+        offset, length, prefix_length = identity(data)
+        record = (offset, length, prefix_length, size)
+        with self.lock:
+            self.records[path] = record
+            if self.file:
+                self.file.write(ExtractionManifest.encode(path, record))
+                self.file.flush()
+
+    def close(self) -> None:
+        """Close the manifest, rewriting it with just the latest record for each file."""
+        if self.file:
+            self.file.close()
+            self.file = None
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                for path, record in self.records.items():
+                    file.write(ExtractionManifest.encode(path, record))
+            os.replace(temporary, self.path)
+
+    @staticmethod
+    def encode(path: str, record: ManifestRecord) -> str:
+        offset, length, prefix_length, size = record
+        line = json.dumps(
+            {
+                "path": path,
+                "offset": offset,
+                "length": length,
+                "prefix_length": prefix_length,
+                "size": size,
+            }
+        )
+        return f"{line}\n"
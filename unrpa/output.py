@@ -0,0 +1,38 @@
+import os
+from types import TracebackType
+from typing import Optional, Type
+
+
+class AtomicOutput:
+    """A file written under a temporary name alongside where it belongs, and only moved into place once finished.
+
+    An interrupted write is then never mistaken for a finished file. Used as a context manager, the file is moved into
+    place if the block completes, and removed if it doesn't.
+    """
+
+    suffix = ".unrpa-partial"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.temporary = f"{path}{AtomicOutput.suffix}"
+
+    def __enter__(self) -> "AtomicOutput":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exception is None:
+            self.finish()
+        else:
+            self.discard()
+
+    def finish(self) -> None:
+        os.replace(self.temporary, self.path)
+
+    def discard(self) -> None:
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
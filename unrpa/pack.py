@@ -0,0 +1,131 @@
+import collections
+import os
+import pickle
+import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import (
+    Dict,
+    Callable,
+    Type,
+    Iterable,
+    Iterator,
+    Tuple,
+    Union,
+    List,
+    BinaryIO,
+    Deque,
+)
+
+from unrpa.errors import PackingNotSupportedError
+from unrpa.output import AtomicOutput
+from unrpa.versions.alt import ALT1
+from unrpa.versions.official_rpa import RPA2, RPA3
+from unrpa.versions.version import Version
+
+# Path In Archive, Contents (A Path To A File, Or The Data Itself)
+Member = Tuple[str, Union[str, bytes]]
+
+# Offset, Key -> Header
+headers: Dict[Type[Version], Callable[[int, int], bytes]] = {
+    RPA2: lambda offset, key: b"RPA-2.0 %016x\n" % offset,
+    RPA3: lambda offset, key: b"RPA-3.0 %016x %08x\n" % (offset, key),
+    ALT1: lambda offset, key: b"ALT-1.0 %08x %016x\n"
+    % (key ^ ALT1.extra_key, offset),
+}
+
+# Versions where the index isn't obfuscated with a key.
+unkeyed: Tuple[Type[Version], ...] = (RPA2,)
+
+
+def members_of(directory: str) -> Iterator[Member]:
+    """The files in a directory (and its subdirectories) as members, in a stable order."""
+    for root, directories, files in os.walk(directory):
+        directories.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, directory).replace(os.sep, "/"), path
+
+
+class ArchiveWriter:
+    """Writes archives in the versions Ren'Py reads, from a directory or any iterable of members.
+
+    Member data is streamed straight into the archive through a large write buffer. With more than one worker, small
+    input files are read ahead on a pool of threads while earlier members are written, and larger ones are copied
+    directly. The archive is written to a temporary file alongside the output, and only moved into place once complete.
+    """
+
+    buffer_size = 8 * 1024 * 1024
+    read_ahead_limit = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        version: Type[Version] = RPA3,
+        key: int = 0xDEADBEEF,
+        workers: int = 1,
+        compression_level: int = zlib.Z_DEFAULT_COMPRESSION,
+    ) -> None:
+        if version not in headers:
+            raise PackingNotSupportedError(version, headers.keys())
+        self.path = path
+        self.version = version
+        self.key = 0 if version in unkeyed else key & 0xFFFFFFFF
+        self.workers = max(1, workers)
+        self.compression_level = compression_level
+
+    def write_directory(self, directory: str) -> None:
+        self.write(members_of(directory))
+
+    def write(self, members: Iterable[Member]) -> None:
+        with AtomicOutput(self.path) as output:
+            with open(output.temporary, "wb", buffering=self.buffer_size) as archive:
+                self.write_archive(archive, members)
+
+    def write_archive(self, archive: BinaryIO, members: Iterable[Member]) -> None:
+        header = headers[self.version]
+        archive.write(b" " * (len(header(0, 0)) - 1) + b"\n")
+        index: Dict[str, List[Union[Tuple[int, int], Tuple[int, int, bytes]]]] = {}
+        key = self.key
+        keyed = self.version not in unkeyed
+        for name, contents in self.read(members):
+            offset = archive.tell()
+            if isinstance(contents, bytes):
+                archive.write(contents)
+            else:
+                with open(contents, "rb") as source:
+                    shutil.copyfileobj(source, archive, self.buffer_size)
+            length = archive.tell() - offset
+            name = name.replace(os.sep, "/")
+            if keyed:
+                index[name] = [(offset ^ key, length ^ key, b"")]
+            else:
+                index[name] = [(offset, length)]
+        index_offset = archive.tell()
+        archive.write(zlib.compress(pickle.dumps(index, 2), self.compression_level))
+        archive.seek(0)
+        archive.write(header(index_offset, key))
+
+    def read(self, members: Iterable[Member]) -> Iterator[Member]:
+        """Read small files ahead of when they are needed on a pool of threads, if there is more than one worker."""
+        if self.workers < 2:
+            yield from members
+            return
+        pending: Deque[Tuple[str, "Future[Union[str, bytes]]"]] = collections.deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for name, contents in members:
+                pending.append((name, executor.submit(self.load, contents)))
+                if len(pending) > self.workers * 2:
+                    done, future = pending.popleft()
+                    yield done, future.result()
+            while pending:
+                done, future = pending.popleft()
+                yield done, future.result()
+
+    def load(self, contents: Union[str, bytes]) -> Union[str, bytes]:
+        if isinstance(contents, bytes):
+            return contents
+        if os.path.getsize(contents) > self.read_ahead_limit:
+            return contents
+        with open(contents, "rb") as source:
+            return source.read()
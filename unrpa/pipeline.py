@@ -0,0 +1,310 @@
+import asyncio
+import concurrent.futures
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, BinaryIO, cast, TYPE_CHECKING
+
+from unrpa.dedupe import open_output_file
+from unrpa.index import ComplexIndexEntry
+from unrpa.manifest import ExtractionManifest
+from unrpa.output import AtomicOutput
+from unrpa.plan import ExtractionPlan
+
+if TYPE_CHECKING:
+    from unrpa import UnRPA
+    from unrpa.session import ArchiveSession
+
+
+class PipelineStopped(Exception):
+    """Raised in the reader when the pipeline is stopped while it is waiting for a writer to catch up."""
+
+
+class Chunk:
+    """Some of a file's data on its way from the reader to a writer."""
+
+    __slots__ = ("path", "entry", "data", "last", "failed")
+
+    def __init__(
+        self,
+        path: str,
+        entry: ComplexIndexEntry,
+        data: List[bytes],
+        last: bool,
+        failed: bool = False,
+    ) -> None:
+        self.path = path
+        self.entry = entry
+        self.data = data
+        self.last = last
+        self.failed = failed
+
+
+class ChunkSink(io.RawIOBase):
+    """A file to postprocess an entry into, which passes the data on to a writer in chunks."""
+
+    def __init__(
+        self,
+        pipeline: "ExtractionPipeline",
+        queue: "asyncio.Queue[Optional[Chunk]]",
+        path: str,
+        entry: ComplexIndexEntry,
+    ) -> None:
+        self.pipeline = pipeline
+        self.queue = queue
+        self.path = path
+        self.entry = entry
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore
+        view = memoryview(data).cast("B")
+        chunk_size = self.pipeline.chunk_size
+        # A large write (like a whole file from a memory-mapped archive) is split up, so it is held back by the queue a
+        # chunk at a time rather than being buffered all at once.
+        for start in range(0, len(view), chunk_size):
+            piece = view[start : start + chunk_size]
+            # The data may be a view onto a buffer that is about to be reused, so it has to be copied.
+            self.pending.append(bytes(piece))
+            self.pending_size += len(piece)
+            if self.pending_size >= chunk_size:
+                self.send(False)
+        return len(view)
+
+    def finish(self) -> None:
+        self.send(True)
+
+    def fail(self) -> None:
+        self.pending = []
+        self.send(True, failed=True)
+
+    def send(self, last: bool, failed: bool = False) -> None:
+        chunk = Chunk(self.path, self.entry, self.pending, last, failed)
+        self.pending = []
+        self.pending_size = 0
+        self.pipeline.put(self.queue, chunk)
+
+
+class OutputFile:
+    """A file being written by a writer, a chunk at a time.
+
+    Writing a chunk and discarding the file are done under a lock, so a file discarded while a chunk is still being
+    written (when the writer is cancelled) is only closed once that write is done.
+    """
+
+    def __init__(
+        self,
+        extractor: "UnRPA",
+        path: str,
+        entry: ComplexIndexEntry,
+        manifest: Optional[ExtractionManifest],
+        plan: Optional[ExtractionPlan] = None,
+    ) -> None:
+        self.extractor = extractor
+        self.path = path
+        self.entry = entry
+        self.manifest = manifest
+        self.plan = plan
+        self.output_path = os.path.join(extractor.path, path)
+        self.atomic = AtomicOutput(self.output_path) if manifest else None
+        self.write_path = self.atomic.temporary if self.atomic else self.output_path
+        self.file: Optional[BinaryIO] = None
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def write(self, data: List[bytes], last: bool) -> None:
+        with self.lock:
+            self.write_chunk(data, last)
+
+    def write_chunk(self, data: List[bytes], last: bool) -> None:
+        if self.file is None:
+            if not self.plan or not self.plan.created(os.path.dirname(self.path)):
+                with self.extractor.phase("create_directories"):
+                    self.extractor.make_directory_structure(
+                        os.path.dirname(self.output_path)
+                    )
+            if self.plan:
+                _, length, _ = next(iter(self.entry))
+                self.file = self.plan.open_output(self.write_path, length)
+            else:
+                self.file = open_output_file(self.write_path)
+        with self.extractor.phase("copy_data"):
+            for part in data:
+                self.file.write(part)
+        if last:
+            self.finish()
+
+    def finish(self) -> None:
+        if self.file is None:
+            return
+        size = self.file.tell()
+        if self.plan and self.plan.preallocate:
+            self.file.truncate()
+        self.file.close()
+        self.file = None
+        if self.atomic:
+            self.atomic.finish()
+        if self.manifest:
+            self.manifest.record(self.path, self.entry, size)
+        stats = self.extractor.stats
+        if stats:
+            _, length, prefix = next(iter(self.entry))
+            stats.count_file(max(0, length - len(prefix)), size)
+
+    def discard(self) -> None:
+        with self.lock:
+            self.discard_file()
+
+    def discard_file(self) -> None:
+        self.failed = True
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            if self.atomic:
+                self.atomic.discard()
+
+
+class ExtractionPipeline:
+    """Extracts an archive with reading from it and writing the extracted files overlapped.
+
+    A single reader works through the archive in the extractor's schedule, passing each entry's data in chunks onto
+    bounded queues. Writers drain the queues to the output files, each owning the files on its own queue. When the
+    writers fall behind the reader waits, so only around max_buffered bytes are ever held at once. All of the blocking
+    work happens on executor threads, so the event loop is never blocked.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(
+        self,
+        extractor: "UnRPA",
+        session: "ArchiveSession",
+        manifest: Optional[ExtractionManifest] = None,
+        writers: int = 1,
+        max_buffered: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.extractor = extractor
+        self.session = session
+        self.manifest = manifest
+        self.writers = max(1, writers)
+        self.queue_size = max(1, max_buffered // (self.chunk_size * self.writers))
+        self.stopping = threading.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.plan: Optional[ExtractionPlan] = None
+
+    async def run(self) -> List[Tuple[str, str]]:
+        self.loop = asyncio.get_event_loop()
+        queues: List["asyncio.Queue[Optional[Chunk]]"] = [
+            asyncio.Queue(maxsize=self.queue_size) for _ in range(self.writers)
+        ]
+        executor = ThreadPoolExecutor(max_workers=self.writers + 1)
+        writing = [
+            asyncio.ensure_future(self.write(executor, queue)) for queue in queues
+        ]
+        for task in writing:
+            # If a writer stops early, it failed, so the reader has to stop too.
+            task.add_done_callback(lambda _: self.stopping.set())
+        try:
+            try:
+                failures = await self.loop.run_in_executor(
+                    executor, self.read, queues
+                )
+            except PipelineStopped:
+                await asyncio.gather(*(task for task in writing if task.done()))
+                raise
+            for queue in queues:
+                await queue.put(None)
+            for writer_failures in await asyncio.gather(*writing):
+                failures.extend(writer_failures)
+            return failures
+        finally:
+            self.stopping.set()
+            for task in writing:
+                task.cancel()
+            # Let the cancelled writers discard any files they still have open.
+            await asyncio.gather(*writing, return_exceptions=True)
+            executor.shutdown(wait=False)
+
+    def put(self, queue: "asyncio.Queue[Optional[Chunk]]", chunk: Chunk) -> None:
+        """Put a chunk onto a writer's queue from the reader, waiting while it is full."""
+        assert self.loop is not None
+        future = asyncio.run_coroutine_threadsafe(queue.put(chunk), self.loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return
+            except concurrent.futures.TimeoutError:
+                if self.stopping.is_set():
+                    future.cancel()
+                    raise PipelineStopped()
+
+    def read(
+        self, queues: List["asyncio.Queue[Optional[Chunk]]"]
+    ) -> List[Tuple[str, str]]:
+        extractor = self.extractor
+        failures: List[Tuple[str, str]] = []
+        version = self.session.get_version()
+        archive = self.session.file
+        index = self.session.get_index()
+        if self.manifest:
+            index = extractor.remaining(index, self.manifest)
+        self.plan = extractor.plan(index)
+        schedule = extractor.schedule(index)
+        mapped = extractor.mapped_views(archive) if extractor.memory_map else None
+        views = extractor.scheduled_views(
+            schedule.reads, archive, mapped, schedule.total_files, failures
+        )
+        for number, (path, entry, file_view) in enumerate(views):
+            queue = queues[number % len(queues)]
+            sink = ChunkSink(self, queue, path, entry)
+            try:
+                version.postprocess(file_view, cast(BinaryIO, sink))
+                sink.finish()
+            except PipelineStopped:
+                raise
+            except BaseException as error:
+                sink.fail()
+                failures.append(extractor.handle_error(path, error))
+        return failures
+
+    async def write(
+        self, executor: ThreadPoolExecutor, queue: "asyncio.Queue[Optional[Chunk]]"
+    ) -> List[Tuple[str, str]]:
+        assert self.loop is not None
+        failures: List[Tuple[str, str]] = []
+        output: Optional[OutputFile] = None
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return failures
+                if output is None:
+                    output = OutputFile(
+                        self.extractor,
+                        chunk.path,
+                        chunk.entry,
+                        self.manifest,
+                        self.plan,
+                    )
+                try:
+                    if chunk.failed:
+                        await self.loop.run_in_executor(executor, output.discard)
+                    elif not output.failed:
+                        await self.loop.run_in_executor(
+                            executor, output.write, chunk.data, chunk.last
+                        )
+                except asyncio.CancelledError:
+                    raise
+                except BaseException as error:
+                    await self.loop.run_in_executor(executor, output.discard)
+                    failures.append(self.extractor.handle_error(chunk.path, error))
+                if chunk.last:
+                    output = None
+        finally:
+            if output is not None and output.file is not None:
+                # Cancelled part of the way through a file, which will never be finished.
+                await self.loop.run_in_executor(executor, output.discard)
@@ -0,0 +1,85 @@
+import os
+import shutil
+from typing import List, Set, BinaryIO, TYPE_CHECKING
+
+from unrpa.dedupe import open_output_file
+from unrpa.errors import NotEnoughSpaceError
+from unrpa.index import CompactIndex
+
+if TYPE_CHECKING:
+    from unrpa import UnRPA
+
+
+class ExtractionPlan:
+    """What an extraction will write, worked out from the index before any data is copied.
+
+    The directories the files go in are collected once, and only the deepest of them are created (which creates the
+    rest along the way), rather than making sure of the directory of every single file. A directory that can't be
+    created is left for the files in it to try again, so only those files fail. The total size of the files
+    can be checked against the free space up front, so an extraction that won't fit fails before it starts rather than
+    part of the way through, and output files can be allocated at their full size before they are written.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        directories: List[str],
+        total_bytes: int,
+        preallocate: bool = False,
+    ) -> None:
+        self.root = root
+        self.directories = directories
+        self.total_bytes = total_bytes
+        self.preallocate = preallocate and hasattr(os, "posix_fallocate")
+        self.uncreated: Set[str] = set()
+
+    @staticmethod
+    def for_index(
+        root: str, index: CompactIndex, preallocate: bool = False
+    ) -> "ExtractionPlan":
+        directories = {os.path.dirname(path) for path in index}
+        parents = set()
+        for directory in directories:
+            parent = os.path.dirname(directory)
+            while parent and parent not in parents:
+                parents.add(parent)
+                parent = os.path.dirname(parent)
+        leaves = sorted(
+            directory
+            for directory in directories
+            if directory and directory not in parents
+        )
+        return ExtractionPlan(root, leaves, sum(index.lengths), preallocate)
+
+    def check_free_space(self) -> None:
+        free = shutil.disk_usage(self.root).free
+        if self.total_bytes > free:
+            raise NotEnoughSpaceError(self.root, self.total_bytes, free)
+
+    def create_directories(self, extractor: "UnRPA") -> None:
+        for directory in self.directories:
+            try:
+                extractor.make_directory_structure(os.path.join(self.root, directory))
+            except OSError:
+                # It isn't known how much of the way to the directory was created, so none of it is counted.
+                while directory and directory not in self.uncreated:
+                    self.uncreated.add(directory)
+                    directory = os.path.dirname(directory)
+
+    def created(self, directory: str) -> bool:
+        """If the given directory (relative to the root) was created up front, so files can go straight into it."""
+        return directory not in self.uncreated
+
+    def open_output(self, path: str, size: int) -> BinaryIO:
+        """Open an output file for writing, allocated at the given size if preallocating.
+
+        A preallocated file must be truncated to the size actually written once it is finished.
+        """
+        output_file = open_output_file(path)
+        if self.preallocate and size > 0:
+            try:
+                os.posix_fallocate(output_file.fileno(), 0, size)
+            except OSError:
+                # Not every filesystem supports it, and the file can always just grow as it is written instead.
+                pass
+        return output_file
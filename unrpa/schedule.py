@@ -0,0 +1,97 @@
+import functools
+from typing import List, Tuple, BinaryIO, Iterable
+
+from unrpa.index import ComplexIndexEntry, ComplexIndexPart, CompactIndex
+from unrpa.view import ArchiveView, MappedArchiveView, ViewFactory
+
+# File Number, Path, Data
+ScheduledEntry = Tuple[int, str, ComplexIndexEntry]
+# Start, End
+Extent = Tuple[int, int]
+
+
+def extent(part: ComplexIndexPart) -> Extent:
+    """The region of the archive an entry's data is stored in, not including any prefix."""
+    offset, length, prefix = part
+    return offset, offset + max(0, length - len(prefix))
+
+
+def seek_distance(extents: Iterable[Extent]) -> int:
+    """The total distance the archive would be seeked reading the given extents in order, starting at the beginning."""
+    position = 0
+    distance = 0
+    for start, end in extents:
+        distance += abs(start - position)
+        position = max(start, end)
+    return distance
+
+
+class ScheduledRead:
+    """A single sequential read from the archive, covering the data for one or more entries."""
+
+    def __init__(self, start: int, end: int) -> None:
+        self.start = start
+        self.end = end
+        self.entries: List[ScheduledEntry] = []
+
+    def views(self, archive: BinaryIO) -> ViewFactory:
+        """Get views onto the entries, reading the data for all of them in one go if there is more than one."""
+        if len(self.entries) < 2:
+            return functools.partial(ArchiveView, archive)
+        archive.seek(self.start)
+        block = memoryview(archive.read(self.end - self.start))
+        start = self.start
+
+        def view_of(offset: int, length: int, prefix: bytes) -> ArchiveView:
+            return MappedArchiveView(block, archive.name, offset - start, length, prefix)
+
+        return view_of
+
+
+class ExtractionSchedule:
+    """The order to extract an archive's entries in, as a series of reads from the archive."""
+
+    def __init__(
+        self, reads: List[ScheduledRead], total_files: int, seek_distance_saved: int
+    ) -> None:
+        self.reads = reads
+        self.total_files = total_files
+        self.seek_distance_saved = seek_distance_saved
+
+    @staticmethod
+    def in_index_order(index: CompactIndex) -> "ExtractionSchedule":
+        """Read each entry individually, in the order they are in the index."""
+        reads = []
+        for file_number, (path, part) in enumerate(index.rows()):
+            read = ScheduledRead(*extent(part))
+            read.entries.append((file_number, path, [part]))
+            reads.append(read)
+        return ExtractionSchedule(reads, len(index), 0)
+
+    @staticmethod
+    def by_offset(
+        index: CompactIndex, max_gap: int = 64 * 1024, max_read: int = 4 * 1024 * 1024
+    ) -> "ExtractionSchedule":
+        """Read entries in the order they are stored in the archive.
+
+        Entries that are no more than max_gap bytes apart are coalesced into a single read, as long as that read stays
+        within max_read bytes. Entries bigger than that are always read on their own, and streamed rather than read
+        into memory.
+        """
+        reads: List[ScheduledRead] = []
+        current = None
+        for file_number, (path, part) in enumerate(index.in_offset_order()):
+            start, end = extent(part)
+            if (
+                current is not None
+                and start - current.end <= max_gap
+                and max(end, current.end) - current.start <= max_read
+            ):
+                current.end = max(end, current.end)
+            else:
+                current = ScheduledRead(start, end)
+                reads.append(current)
+            current.entries.append((file_number, path, [part]))
+        in_index_order = seek_distance(extent(part) for _, part in index.rows())
+        scheduled = seek_distance((read.start, read.end) for read in reads)
+        return ExtractionSchedule(reads, len(index), in_index_order - scheduled)
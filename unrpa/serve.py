@@ -0,0 +1,171 @@
+import mimetypes
+import os
+import re
+import urllib.parse
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Tuple, Optional, Dict, Any, TYPE_CHECKING
+
+from unrpa.index import ComplexIndexPart
+from unrpa.view import read_at
+
+if TYPE_CHECKING:
+    from unrpa.session import ArchiveSession
+
+range_pattern = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class UnsatisfiableRange(Exception):
+    """Raised when a range is asked for that is entirely outside the file."""
+
+
+def byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The start and end of the byte range asked for in a Range header, or None if the whole file should be sent.
+
+    Only single ranges are supported, anything else is ignored, which is allowed and means sending the whole file.
+    """
+    match = range_pattern.fullmatch(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        suffix = int(last)
+        if suffix == 0:
+            raise UnsatisfiableRange()
+        return max(0, size - suffix), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange()
+    return start, min(int(last) + 1, size) if last else size
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """Serves the files in an archive over HTTP, straight out of the archive without extracting them.
+
+    The archive is opened once and read positionally, so any number of clients can read from it at once. Range requests
+    are supported, and where possible data is sent with sendfile rather than going through Python.
+    """
+
+    daemon_threads = True
+    send_size = 1024 * 1024
+
+    def __init__(self, session: "ArchiveSession", address: Tuple[str, int]) -> None:
+        self.session = session
+        self.extractor = session.extractor
+        self.version = session.get_version()
+        self.archive = session.file
+        self.index = session.get_index()
+        self.rows: Dict[str, int] = {
+            path.replace(os.sep, "/"): row for row, path in enumerate(self.index.paths)
+        }
+        super().__init__(address, MemberRequestHandler)
+
+    def member(self, path: str) -> Optional[ComplexIndexPart]:
+        row = self.rows.get(path)
+        return None if row is None else self.index.part(row)
+
+    def send(
+        self,
+        handler: BaseHTTPRequestHandler,
+        part: ComplexIndexPart,
+        start: int,
+        end: int,
+    ) -> bool:
+        """Send the given range of a member's data, returning if all of it could be sent."""
+        offset, length, prefix = part
+        if start < len(prefix):
+            handler.wfile.write(prefix[start:end])
+        position = offset + max(0, start - len(prefix))
+        remaining = end - max(start, len(prefix))
+        if remaining <= 0:
+            return True
+        handler.wfile.flush()
+        if hasattr(os, "sendfile"):
+            connection = handler.connection.fileno()
+            archive = self.archive.fileno()
+            while remaining > 0:
+                sent = os.sendfile(connection, archive, position, remaining)
+                if not sent:
+                    return False
+                position += sent
+                remaining -= sent
+        else:
+            buffer = memoryview(bytearray(min(remaining, ArchiveServer.send_size)))
+            while remaining > 0:
+                read = read_at(self.archive, buffer[:remaining], position)
+                if not read:
+                    return False
+                handler.wfile.write(buffer[:read])
+                position += read
+                remaining -= read
+        return True
+
+
+class MemberRequestHandler(BaseHTTPRequestHandler):
+    server: ArchiveServer
+
+    def do_GET(self) -> None:
+        self.respond(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.respond(send_body=False)
+
+    def respond(self, send_body: bool) -> None:
+        url_path = urllib.parse.urlsplit(self.path).path
+        path = urllib.parse.unquote(url_path).lstrip("/")
+        if not path:
+            self.send_listing(send_body)
+            return
+        part = self.server.member(path)
+        if part is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        data = None
+        if self.server.version.has_postprocessing():
+            # The data has to be transformed, so it can't be served straight out of the archive.
+            data = self.server.session.member_file(part).read()
+            size = len(data)
+        else:
+            _, size, _ = part
+        try:
+            requested = byte_range(self.headers.get("Range"), size)
+        except UnsatisfiableRange:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = requested if requested else (0, size)
+        status = HTTPStatus.PARTIAL_CONTENT if requested else HTTPStatus.OK
+        self.send_response(status)
+        content_type, _ = mimetypes.guess_type(path)
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if requested:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+        if data is not None:
+            self.wfile.write(data[start:end])
+        elif not self.server.send(self, part, start, end):
+            # The archive ends before the file should, and the headers are already sent, so all we can do is stop.
+            self.close_connection = True
+
+    def send_listing(self, send_body: bool) -> None:
+        listing = "".join(f"{path}\n" for path in self.server.rows).encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(listing)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(listing)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        extractor = self.server.extractor
+        extractor.log(extractor.info, f"{self.address_string()} - {format % args}")
@@ -0,0 +1,150 @@
+import io
+import os
+import threading
+from types import TracebackType
+from typing import Optional, Tuple, List, Type, TYPE_CHECKING
+
+from unrpa.diff import ArchiveDiff
+from unrpa.errors import MemberNotFoundError
+from unrpa.index import CompactIndex, ComplexIndexPart
+from unrpa.versions.version import Version
+from unrpa.view import ArchiveView, MemberReader
+
+if TYPE_CHECKING:
+    from unrpa import UnRPA, TreeNode
+
+
+class ArchiveSession:
+    """An archive opened once for any number of operations on it.
+
+    The archive's version, offset and key, and index are each worked out the first time they are needed, and then
+    shared by every later operation rather than opening and decoding the archive again. Files opened with open are read
+    positionally and can be used from any thread, but other operations share the session's handle on the archive, so
+    shouldn't run at the same time as each other.
+    """
+
+    def __init__(self, extractor: "UnRPA") -> None:
+        self.extractor = extractor
+        self.file = open(extractor.archive, "rb")
+        self.lock = threading.RLock()
+        self.version: Optional[Version] = None
+        self.offset_and_key: Optional[Tuple[int, Optional[int]]] = None
+        self.full_index: Optional[CompactIndex] = None
+        self.index: Optional[CompactIndex] = None
+
+    def __enter__(self) -> "ArchiveSession":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[BaseException]],
+        exception: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def get_version(self) -> Version:
+        with self.lock:
+            if self.version is None:
+                extractor = self.extractor
+                if extractor.version:
+                    self.version = extractor.version()
+                else:
+                    self.version = extractor.detect_version(self.file)
+                if self.version.has_postprocessing():
+                    # Versions with their own postprocessing may rely on state set up while finding the offset and key.
+                    self.get_offset_and_key()
+            return self.version
+
+    def get_offset_and_key(self) -> Tuple[int, Optional[int]]:
+        with self.lock:
+            if self.offset_and_key is None:
+                extractor = self.extractor
+                if extractor.offset_and_key:
+                    self.offset_and_key = extractor.offset_and_key
+                else:
+                    version = self.get_version()
+                    self.file.seek(0)
+                    with extractor.phase("find_offset_and_key"):
+                        self.offset_and_key = version.find_offset_and_key(self.file)
+            return self.offset_and_key
+
+    def get_full_index(self) -> CompactIndex:
+        """The whole index of the archive, ignoring any path filter.
+
+        The version, offset and key are only worked out if the index isn't in the index cache and has to be decoded.
+        """
+        with self.lock:
+            if self.full_index is None:
+                extractor = self.extractor
+                full_index = extractor.cached_index()
+                if full_index is None:
+                    full_index = extractor.decode_index(
+                        self.file, self.get_version(), self.get_offset_and_key()
+                    )
+                self.full_index = full_index
+            return self.full_index
+
+    def get_index(self) -> CompactIndex:
+        """The index of the archive, narrowed down by the path filter if there is one."""
+        with self.lock:
+            if self.index is None:
+                self.index = self.extractor.select(self.get_full_index())
+            return self.index
+
+    def paths(self) -> List[str]:
+        return list(self.get_index())
+
+    def tree(self) -> "TreeNode":
+        return self.extractor.index_tree(self.get_index())
+
+    def diff(self, base: Optional[str] = None) -> ArchiveDiff:
+        """Compare the archive to an earlier revision of it, by default the extractor's diff base."""
+        base = base or self.extractor.diff_base
+        if not base:
+            raise Exception("There is no diff base to compare against.")
+        return ArchiveDiff.compare(self, base)
+
+    def extract(self) -> List[Tuple[str, str]]:
+        return self.extractor.extract_all(self)
+
+    def open(self, member: str, close_session: bool = False) -> io.BufferedIOBase:
+        """Open a single file in the archive for reading, without extracting it.
+
+        The file is seekable and reads are positional, so any number can be open at once. Versions that transform the
+        data (see Version.has_postprocessing) can't be read in place, so the file is transformed into memory instead.
+        If close_session is given, the session is closed along with the file.
+        """
+        index = self.get_full_index()
+        path = member.replace("/", os.sep)
+        if path not in index:
+            raise MemberNotFoundError(self.extractor.archive, member)
+        return self.member_file(index.part(index.row(path)), close_session)
+
+    def member_file(
+        self, part: ComplexIndexPart, close_session: bool = False
+    ) -> io.BufferedIOBase:
+        """A seekable file over the data of an entry in the archive, as it would be extracted (see open)."""
+        version = self.get_version()
+        offset, length, prefix = part
+        if version.has_postprocessing():
+            data = io.BytesIO()
+            with self.lock:
+                view = ArchiveView(self.file, offset, length, prefix)
+                version.postprocess(view, data)
+            data.seek(0)
+            if close_session:
+                self.close()
+            return data
+        else:
+            return io.BufferedReader(
+                MemberReader(self.file, offset, length, prefix, close_session)
+            )
+
+    def read(self, member: str) -> bytes:
+        """Read the whole of a single file in the archive, without extracting it."""
+        with self.open(member) as file:
+            return file.read()
@@ -0,0 +1,102 @@
+import contextlib
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional, Iterator, Any, ContextManager
+
+# Shared by everything that isn't collecting stats, so measuring costs nothing but a check when it's turned off.
+not_measured: ContextManager[None] = contextlib.nullcontext()
+
+
+class ArchiveStats:
+    """Timings and counts for the phases of working with an archive.
+
+    Phases are timed as they run, and time spent in the same phase is added together, so with several workers
+    extracting at once, the per-phase times add up to more than the total time taken.
+    """
+
+    phase_names = (
+        "detect_version",
+        "find_offset_and_key",
+        "index_cache",
+        "decompress_index",
+        "unpickle_index",
+        "normalise_index",
+        "plan_extraction",
+        "create_directories",
+        "copy_data",
+    )
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.phases: Dict[str, float] = {}
+        self.total = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.files = 0
+        self.peak_memory: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def run(self) -> Iterator[None]:
+        """Measure a whole operation on the archive, tracing the peak memory used if asked to."""
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.total += time.perf_counter() - start
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.peak_memory = max(peak, self.peak_memory or 0)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count_read(self, size: int) -> None:
+        with self.lock:
+            self.bytes_read += size
+
+    def count_file(self, read: int, written: int) -> None:
+        with self.lock:
+            self.files += 1
+            self.bytes_read += read
+            self.bytes_written += written
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": self.total,
+            "phases": {
+                name: self.phases[name]
+                for name in ArchiveStats.phase_names
+                if name in self.phases
+            },
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "files": self.files,
+            "files_per_second": (
+                self.files / self.total if self.files and self.total else None
+            ),
+            "peak_memory_bytes": self.peak_memory,
+        }
@@ -0,0 +1,112 @@
+import codecs
+import contextlib
+import gc
+import itertools
+import operator
+import os
+import pickle
+import sys
+from array import array
+from typing import Dict, Tuple, Callable, Any, Optional, BinaryIO, Iterator
+
+from unrpa.errors import UnsafeIndexError
+from unrpa.index import CompactIndex
+
+# The only callables an index may refer to, which are how protocol 2 pickles written by Python 3 encode bytes.
+allowed_globals: Dict[Tuple[str, str], Callable[..., Any]] = {
+    ("_codecs", "encode"): codecs.encode,
+    ("codecs", "encode"): codecs.encode,
+    ("__builtin__", "bytes"): bytes,
+    ("builtins", "bytes"): bytes,
+}
+
+
+class IndexUnpickler(pickle.Unpickler):
+    """An unpickler that can only load the plain data an index is made of.
+
+    Pickles can call anything they name, so a malicious archive could run code when its index is loaded. Indexes are
+    only ever made of dictionaries, lists, tuples, strings and integers, so anything else is refused.
+    """
+
+    def find_class(self, module: str, name: str) -> Callable[..., Any]:
+        try:
+            return allowed_globals[(module, name)]
+        except KeyError:
+            raise UnsafeIndexError(module, name) from None
+
+
+def load_index(file: BinaryIO) -> Any:
+    return IndexUnpickler(file, encoding="bytes").load()
+
+
+@contextlib.contextmanager
+def collection_paused() -> Iterator[None]:
+    """Pause the cyclic garbage collector while an index is loaded.
+
+    Otherwise it repeatedly scans the many lists and tuples a large index is made of, none of which can be garbage yet.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def compact_index(index: Any, key: Optional[int]) -> Optional[CompactIndex]:
+    """Build a compact index from an unpickled one in the shape Ren'Py writes, or None if it isn't in that shape.
+
+    The usual shape is a dictionary of paths (all bytes or all strings) to lists where every first part has the same
+    number of items, which can be turned into columns as a whole rather than normalising the entries one at a time.
+    """
+    if type(index) is not dict:
+        return None
+    try:
+        paths = list(index)
+        path_types = set(map(type, paths))
+        if path_types == {bytes}:
+            paths = [path.decode("utf-8", "replace") for path in paths]
+        elif path_types and path_types != {str}:
+            return None
+        if os.sep != "/":
+            paths = [path.replace("/", os.sep) for path in paths]
+        if len(set(paths)) != len(paths):
+            # Paths that only differ in type or separator would need later entries to replace earlier ones.
+            return None
+        firsts = [entry[0] for entry in index.values()]
+        sizes = set(map(len, firsts))
+        if not firsts:
+            return CompactIndex.build([])
+        elif sizes == {3}:
+            offsets, lengths, prefixes = zip(*firsts)
+        elif sizes == {2}:
+            offsets, lengths = zip(*firsts)
+            prefixes = None
+        else:
+            return None
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        # An item getter for every row in path order reorders a whole column in one call.
+        reorder = operator.itemgetter(*order) if len(order) > 1 else tuple
+        offset_column = array("Q", reorder(offsets))
+        length_column = array("Q", reorder(lengths))
+        prefix_bounds = array("Q", [0])
+        if prefixes and any(prefixes):
+            ordered_prefixes = reorder(prefixes)
+            prefix_blob = b"".join(ordered_prefixes)
+            prefix_bounds.extend(itertools.accumulate(map(len, ordered_prefixes)))
+        else:
+            prefix_blob = b""
+            prefix_bounds *= len(order) + 1
+    except (TypeError, IndexError, KeyError, OverflowError):
+        return None
+    compact = CompactIndex(
+        list(map(sys.intern, reorder(paths))),
+        offset_column,
+        length_column,
+        prefix_bounds,
+        prefix_blob,
+    )
+    if key is not None:
+        compact.deobfuscate(key)
+    return compact
@@ -21,8 +21,11 @@ class Version(metaclass=ABCMeta):
 
     def postprocess(self, source: ArchiveView, sink: BinaryIO) -> None:
         """Allows postprocessing over the data extracted from the archive."""
-        for segment in iter(source.read1, b""):
-            sink.write(segment)
+        source.copy_to(sink)
+
+    def has_postprocessing(self) -> bool:
+        """If this version transforms the data extracted from the archive, rather than copying it as it is."""
+        return type(self).postprocess is not Version.postprocess
 
     def __str__(self) -> str:
         return self.name
@@ -1,10 +1,12 @@
 import ast
+import hashlib
 import io
-import itertools
+import json
 import os
 import re
-import struct
-from typing import BinaryIO, Tuple, Optional, Type
+import tempfile
+import threading
+from typing import BinaryIO, Tuple, Optional, Type, Union, Dict
 
 from unrpa.versions.errors import (
     VersionSpecificRequirementUnmetError,
@@ -13,11 +15,23 @@ from unrpa.versions.errors import (
 from unrpa.versions.version import HeaderBasedVersion, Version
 from unrpa.view import ArchiveView
 
+try:
+    import numpy  # type: ignore
+except ImportError:
+    numpy = None
+
 loader_name = "loader.pyo"
 
+# Key, Obfuscated Amount
+LoaderDetails = Tuple[int, Optional[int]]
+
+
+def get_loader_path(archive: BinaryIO) -> str:
+    return os.path.join(os.path.dirname(archive.name), loader_name)
+
 
 def get_loader(archive: BinaryIO) -> str:
-    path = os.path.join(os.path.dirname(archive.name), loader_name)
+    path = get_loader_path(archive)
     try:
         import uncompyle6  # type: ignore
     except ImportError as e:
@@ -38,10 +52,85 @@ def find_key(loader: str) -> int:
         return obfuscation_sha1(vc_match.group(1))
 
 
+def find_amount(loader: str) -> Optional[int]:
+    oa_match = re.search(
+        r"_string.run\(rv.read\(([0-9]*?)\), verificationcode\)", loader
+    )
+    return ast.literal_eval(oa_match.group(1)) if oa_match else None
+
+
 def find_offset(archive: BinaryIO) -> int:
     return obfuscation_offset(archive.readline().split()[-1])
 
 
+class LoaderCache:
+    """A cache of the details found by decompiling loaders, so each loader only ever needs decompiling once.
+
+    Details are keyed by a hash of the loader's contents and always kept in memory. They are only kept on disk once a
+    directory is given with use_directory, which is done for the index cache's directory.
+    """
+
+    file_name = "zix-loaders.json"
+
+    def __init__(self, directory: Optional[str]) -> None:
+        self.directory = directory
+        self.details: Dict[str, LoaderDetails] = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def get(self, archive: BinaryIO) -> LoaderDetails:
+        path = get_loader_path(archive)
+        try:
+            with open(path, "rb") as loader:
+                digest = hashlib.sha256(loader.read()).hexdigest()
+        except FileNotFoundError as e:
+            raise LoaderRequiredError(path) from e
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            cached = self.details.get(digest)
+        if cached:
+            return cached
+        loader_source = get_loader(archive)
+        details = (find_key(loader_source), find_amount(loader_source))
+        with self.lock:
+            self.details[digest] = details
+            self.save()
+        return details
+
+    def use_directory(self, directory: Optional[str]) -> None:
+        with self.lock:
+            if directory != self.directory:
+                self.directory = directory
+                self.loaded = False
+
+    def load(self) -> None:
+        self.loaded = True
+        if not self.directory:
+            return
+        try:
+            with open(os.path.join(self.directory, LoaderCache.file_name)) as file:
+                for digest, (key, amount) in json.load(file).items():
+                    self.details.setdefault(digest, (key, amount))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self) -> None:
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(descriptor, "w") as file:
+                json.dump(self.details, file)
+            os.replace(temporary, os.path.join(self.directory, LoaderCache.file_name))
+        except OSError:
+            pass
+
+
+loader_cache = LoaderCache(None)
+
+
 class ZiX12A(HeaderBasedVersion):
     """A proprietary format with additional obfuscation."""
 
@@ -49,8 +138,7 @@ class ZiX12A(HeaderBasedVersion):
     header = b"ZiX-12A"
 
     def find_offset_and_key(self, archive: BinaryIO) -> Tuple[int, Optional[int]]:
-        loader = get_loader(archive)
-        key = find_key(loader)
+        key, _ = loader_cache.get(archive)
         return find_offset(archive), key
 
 
@@ -64,30 +152,28 @@ class ZiX12B(HeaderBasedVersion):
         self.details: Optional[Tuple[int, int]] = None
 
     def find_offset_and_key(self, archive: BinaryIO) -> Tuple[int, Optional[int]]:
-        loader = get_loader(archive)
-        key = find_key(loader)
-        oa_match = re.search(
-            r"_string.run\(rv.read\(([0-9]*?)\), verificationcode\)", loader
-        )
-        if not oa_match:
+        key, amount = loader_cache.get(archive)
+        if amount is None:
             raise IncorrectLoaderError()
         else:
-            self.details = (key, ast.literal_eval(oa_match.group(1)))
+            self.details = (key, amount)
         return find_offset(archive), key
 
     def postprocess(self, source: ArchiveView, sink: BinaryIO) -> None:
         if self.details:
             key, amount = self.details
-            parts = []
-            while amount > 0:
-                part = source.read(amount)
-                amount -= len(part)
-                parts.append(part)
-            sink.write(obfuscation_run(b"".join(parts), key))
+            buffer = memoryview(bytearray(amount))
+            filled = 0
+            while filled < amount:
+                read = source.readinto(buffer[filled:])
+                if not read:
+                    break
+                filled += read
+            obfuscation_run_in_place(buffer[:filled], key)
+            sink.write(buffer[:filled])
         else:
             raise Exception("find_offset_and_key must be called before postprocess")
-        for segment in iter(source.read1, b""):
-            sink.write(segment)
+        source.copy_to(sink)
 
 
 versions: Tuple[Type[Version], ...] = (ZiX12A, ZiX12B)
@@ -141,11 +227,26 @@ def obfuscation_offset(value: bytes) -> int:
 
 
 def obfuscation_run(s: bytes, key: int) -> bytes:
-    count = len(s) // 8
-    struct_format = f"<{'Q'*count}"
-    encoded = struct.unpack(struct_format, s)
-    decoded = (
-        magic_key ^ key ^ part
-        for (magic_key, part) in zip(itertools.cycle(magic_keys), encoded)
-    )
-    return struct.pack(struct_format, *decoded)
+    data = bytearray(s)
+    obfuscation_run_in_place(data, key)
+    return bytes(data)
+
+
+def obfuscation_run_in_place(buffer: Union[bytearray, memoryview], key: int) -> None:
+    """Run the obfuscation over every whole 64-bit word in the buffer at once, modifying it in place."""
+    count = len(buffer) // 8
+    if not count:
+        return
+    keys = [magic_key ^ key for magic_key in magic_keys]
+    if numpy is not None:
+        words = numpy.frombuffer(buffer, dtype="<u8", count=count)
+        stream = numpy.resize(numpy.array(keys, dtype="<u8"), count)
+        numpy.bitwise_xor(words, stream, out=words)
+    else:
+        size = count * 8
+        pattern = b"".join(part.to_bytes(8, "little") for part in keys)
+        stream = (pattern * (count // len(keys) + 1))[:size]
+        words = int.from_bytes(buffer[:size], "little")
+        buffer[:size] = (words ^ int.from_bytes(stream, "little")).to_bytes(
+            size, "little"
+        )
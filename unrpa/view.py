@@ -1,5 +1,28 @@
 import io
-from typing import cast, Callable, BinaryIO
+import operator
+import os
+import threading
+from typing import cast, Callable, BinaryIO, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
+
+
+copy_buffer_size = 1024 * 1024
+copy_buffers = threading.local()
+
+
+def copy_buffer() -> memoryview:
+    """A buffer for copying data, allocated once per thread and then reused."""
+    buffer: Optional[memoryview] = getattr(copy_buffers, "buffer", None)
+    if buffer is None:
+        buffer = memoryview(bytearray(copy_buffer_size))
+        copy_buffers.buffer = buffer
+    return buffer
+
+
+read_method = operator.attrgetter("read")
+read1_method = operator.attrgetter("read1")
 
 
 class ArchiveView:
@@ -14,25 +37,192 @@ class ArchiveView:
             self.sources.insert(0, cast(io.BufferedIOBase, io.BytesIO(prefix)))
 
     def read(self, amount: int = -1) -> bytes:
-        return self.base_read(lambda source: source.read, amount)
+        return self.base_read(read_method, amount)
 
     def read1(self, amount: int = -1) -> bytes:
-        return self.base_read(lambda source: source.read1, amount)
+        return self.base_read(read1_method, amount)
 
     def base_read(
         self, method: Callable[[io.BufferedIOBase], Callable[[int], bytes]], amount: int
     ) -> bytes:
         if amount < 0 or amount > self.remaining:
             amount = self.remaining
-        if self.sources and self.remaining > 0:
+        while self.sources and self.remaining > 0:
             segment = method(self.sources[0])(amount)
             if segment:
                 self.remaining -= len(segment)
                 return segment
-            else:
-                self.sources.pop(0)
-                return self.base_read(method, amount)
+            self.sources.pop(0)
+        if self.remaining != 0:
+            raise Exception("End of archive reached before the file should end.")
+        return b""
+
+    def readinto(self, buffer: memoryview) -> int:
+        if len(buffer) > self.remaining:
+            buffer = buffer[: self.remaining]
+        if not buffer:
+            return 0
+        while self.sources:
+            read = self.sources[0].readinto(buffer)
+            if read:
+                self.remaining -= read
+                return read
+            self.sources.pop(0)
+        raise Exception("End of archive reached before the file should end.")
+
+    def copy_to(self, sink: BinaryIO) -> None:
+        """Copy the rest of the data to the sink, reusing a single buffer for the whole copy."""
+        buffer = copy_buffer()
+        while self.remaining > 0:
+            read = self.readinto(buffer)
+            sink.write(buffer[:read])
+
+
+# Offset, Length, Prefix -> View
+ViewFactory = Callable[[int, int, bytes], ArchiveView]
+
+
+class MemorySegment:
+    """A readable region of memory that hands out views of the data rather than copies."""
+
+    def __init__(self, data: memoryview):
+        self.data = data
+        self.position = 0
+
+    def read(self, amount: int = -1) -> memoryview:
+        if amount < 0:
+            amount = len(self.data) - self.position
+        segment = self.data[self.position : self.position + amount]
+        self.position += len(segment)
+        return segment
+
+    read1 = read
+
+    def readinto(self, buffer: memoryview) -> int:
+        amount = min(len(buffer), len(self.data) - self.position)
+        buffer[:amount] = self.data[self.position : self.position + amount]
+        self.position += amount
+        return amount
+
+
+class MappedArchiveView(ArchiveView):
+    """An archive view over a memory-mapped archive, where reads return views of the mapping rather than copies."""
+
+    def __init__(
+        self, mapping: memoryview, name: str, offset: int, length: int, prefix: bytes
+    ):
+        prefix = prefix[:length]
+        self.name = name
+        self.remaining = length
+        self.sources = [
+            cast(
+                io.BufferedIOBase,
+                MemorySegment(mapping[offset : offset + length - len(prefix)]),
+            )
+        ]
+        if prefix:
+            self.sources.insert(
+                0, cast(io.BufferedIOBase, MemorySegment(memoryview(prefix)))
+            )
+
+    def copy_to(self, sink: BinaryIO) -> None:
+        """Copy the rest of the data to the sink, writing views of the mapping directly."""
+        for segment in iter(self.read1, b""):
+            sink.write(segment)
+
+
+seek_lock = threading.Lock()
+
+
+def read_at(archive: BinaryIO, buffer: memoryview, position: int) -> int:
+    """Read into the buffer from the given position in the archive, without using or moving its shared position."""
+    if hasattr(os, "preadv"):
+        return os.preadv(archive.fileno(), [buffer], position)
+    elif hasattr(os, "pread"):
+        data = os.pread(archive.fileno(), len(buffer), position)
+    else:
+        with seek_lock:
+            archive.seek(position)
+            data = archive.read(len(buffer))
+    buffer[: len(data)] = data
+    return len(data)
+
+
+class MemberReader(io.RawIOBase):
+    """A seekable, read-only file over a single file in an archive.
+
+    Reads are positional, so any number of readers can be used at once over one handle on the archive without
+    interfering with each other.
+    """
+
+    def __init__(
+        self,
+        archive: BinaryIO,
+        offset: int,
+        length: int,
+        prefix: bytes,
+        close_archive: bool = False,
+    ):
+        self.archive = archive
+        self.name = archive.name
+        self.offset = offset
+        self.length = length
+        self.prefix = prefix[:length]
+        self.position = 0
+        self.close_archive = close_archive
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.length + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence}).")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}.")
+        self.position = position
+        return position
+
+    def readinto(self, buffer: "WriteableBuffer") -> int:
+        view = memoryview(buffer).cast("B")
+        amount = min(len(view), self.length - self.position)
+        if amount <= 0:
+            return 0
+        prefix_length = len(self.prefix)
+        if self.position < prefix_length:
+            read = min(amount, prefix_length - self.position)
+            view[:read] = self.prefix[self.position : self.position + read]
         else:
-            if self.remaining != 0:
+            read = read_at(
+                self.archive,
+                view[:amount],
+                self.offset + self.position - prefix_length,
+            )
+            if not read:
                 raise Exception("End of archive reached before the file should end.")
-            return b""
+        self.position += read
+        return read
+
+    def readall(self) -> bytes:
+        data = bytearray(max(0, self.length - self.position))
+        view = memoryview(data)
+        read = 0
+        while read < len(data):
+            read += self.readinto(view[read:])
+        return bytes(data)
+
+    def close(self) -> None:
+        if not self.closed and self.close_archive:
+            self.archive.close()
+        super().close()